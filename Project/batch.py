@@ -0,0 +1,100 @@
+import argparse
+import json
+import sys
+
+from instrumentation import metrics
+from recommender import Recommender, UserProfile
+
+# Upper bound on the users x movies score matrix held at once (float32 cells)
+MAX_CHUNK_CELLS = 32 * 1024 * 1024
+
+
+def read_profiles(path):
+    """Yield profiles from a JSONL file, or a JSON file holding one profile or a list."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield UserProfile.from_dict(json.loads(line))
+        else:
+            data = json.load(f)
+            for item in data if isinstance(data, list) else [data]:
+                yield UserProfile.from_dict(item)
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def default_chunk_size(catalog):
+    return max(1, MAX_CHUNK_CELLS // max(1, len(catalog)))
+
+
+def user_seeds(seed, offset, count):
+    """Per-user seeds derived from one run seed and each user's position in the input."""
+    if seed is None:
+        return None
+    if seed < 0:
+        raise ValueError("seed must not be negative")
+    return [[seed, offset + i] for i in range(count)]
+
+
+def recommend_batch(recommender, profiles, k=5, chunk_size=None, seed=None):
+    """Yield (profile, recommendations) for every profile, scoring chunk by chunk."""
+    chunk_size = chunk_size or default_chunk_size(recommender.catalog)
+    offset = 0
+    for chunk in chunked(profiles, chunk_size):
+        seeds = user_seeds(seed, offset, len(chunk))
+        offset += len(chunk)
+        with metrics.span("batch_chunk"):
+            results = recommender.scorer.top_k_batch(chunk, k, seeds=seeds)
+        yield from zip(chunk, results)
+
+
+def write_results(recommender, results, out):
+    titles = recommender.catalog.titles
+    for profile, recs in results:
+        row = {
+            "email": profile.email,
+            "recommendations": [
+                {"movie_id": r.movie_id, "title": titles[r.movie_id], "match_score": r.score}
+                for r in recs
+            ],
+        }
+        out.write(json.dumps(row) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score many CineMate profiles in one pass")
+    parser.add_argument("profiles", help="profiles as .jsonl, or .json with one profile or a list")
+    parser.add_argument("--catalog", help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--out", help="output JSONL file (default: stdout)")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, help="users scored per matrix product")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes sharing the catalog through shared memory")
+    parser.add_argument("--seed", type=int, help="seed for the score jitter, for reproducible runs")
+    args = parser.parse_args()
+    if args.seed is not None and args.seed < 0:
+        parser.error("--seed must not be negative")
+
+    recommender = Recommender.from_path(args.catalog)
+    profiles = read_profiles(args.profiles)
+    if args.workers > 1:
+        from parallel import recommend_batch_parallel
+        results = recommend_batch_parallel(recommender, profiles, args.k, args.chunk_size,
+                                           args.workers, args.seed)
+    else:
+        results = recommend_batch(recommender, profiles, args.k, args.chunk_size, args.seed)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out:
+            write_results(recommender, results, out)
+    else:
+        write_results(recommender, results, sys.stdout)
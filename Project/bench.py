@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from catalog import StringTable, open_catalog, write_catalog
+from facets import Filters
+from ingest import Ingestor
+from profile_store import ProfileStore
+from recommender import Recommender, UserProfile
+from scoring import MovieCatalog
+
+GENRES = [
+    "Drama", "Comedy", "Thriller", "Action", "Romance", "Crime", "Horror", "Documentary",
+    "Adventure", "Sci-Fi", "Family", "Mystery", "Fantasy", "Animation", "Biography",
+    "History", "Music", "War", "Western", "Sport",
+]
+
+# A typical narrow query: recent, short and well rated
+FILTERS = Filters(min_year=2000, max_duration=120, min_rating=8.0)
+
+
+def synthetic_titles(n, seed=0, vocabulary=20000):
+    """Titles of 1-4 made-up words, word popularity Zipf-like, letters English-like."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("etaoinshrdlcumwfgypbvkjxqz"))
+    frequency = np.array([12.7, 9.1, 8.2, 7.5, 7.0, 6.7, 6.3, 6.1, 6.0, 4.3, 4.0, 2.8, 2.8,
+                          2.4, 2.4, 2.2, 2.0, 2.0, 1.9, 1.5, 1.0, 0.8, 0.15, 0.15, 0.1, 0.07])
+    frequency /= frequency.sum()
+    words = {"".join(rng.choice(letters, rng.integers(2, 10), p=frequency)).capitalize()
+             for _ in range(vocabulary * 2)}
+    words = rng.permutation(sorted(words))[:vocabulary]
+    popularity = 1 / np.arange(1, len(words) + 1)
+    counts = rng.integers(1, 5, n)
+    picks = words[rng.choice(len(words), counts.sum(), p=popularity / popularity.sum())]
+    ends = np.cumsum(counts)
+    return [" ".join(picks[end - count:end]) for end, count in zip(ends, counts)]
+
+
+def synthetic_catalog(n, seed=0):
+    """Catalog of n movies with a long-tailed genre distribution (Drama common, Sport rare)."""
+    rng = np.random.default_rng(seed)
+    # Zipf-like genre popularity, about 2 genres per movie on average
+    popularity = 1 / np.arange(1, len(GENRES) + 1) ** 0.8
+    popularity = popularity / popularity.sum() * 2.2
+    genre_matrix = (rng.random((n, len(GENRES))) < np.minimum(popularity, 0.9)).astype(np.uint8)
+    empty = np.flatnonzero(genre_matrix.sum(axis=1) == 0)
+    genre_matrix[empty, rng.choice(len(GENRES), len(empty), p=popularity / popularity.sum())] = 1
+
+    rating = np.round(np.clip(rng.normal(6.5, 1.2, n), 1, 10), 1).astype(np.float32)
+    year = (2025 - np.minimum(rng.exponential(20, n), 105)).astype(np.int16)
+    duration = np.clip(rng.normal(110, 20, n), 60, 240).astype(np.int16)
+    titles = StringTable.from_strings(synthetic_titles(n, seed))
+    return MovieCatalog(titles, GENRES, genre_matrix, rating, year, duration, version=f"synthetic-{n}-{seed}")
+
+
+def synthetic_users(catalog, n, seed=0, max_history=50):
+    rng = np.random.default_rng(seed)
+    popularity = catalog.genre_matrix[:10000].sum(axis=0).astype(np.float64)
+    popularity /= popularity.sum()
+    users = []
+    for i in range(n):
+        genres = rng.choice(len(GENRES), size=rng.integers(1, 4), replace=False, p=popularity)
+        history = rng.integers(0, len(catalog), size=rng.integers(0, max_history))
+        users.append(UserProfile(
+            genres=[GENRES[g] for g in genres],
+            age=int(rng.integers(13, 70)),
+            watched_movies=[catalog.titles[m] for m in history],
+            email=f"user{i}@example.com",
+        ))
+    return users
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+def measure(fn, items):
+    """Latency of fn(item) for every item, plus the peak traced allocation while running."""
+    tracemalloc.start()
+    times = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        times.append(time.perf_counter() - started)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(percentiles(times), peak_mb=round(peak / 2**20, 1))
+
+
+def full_scan(engine, k):
+    # the pre-index approach: score every movie, then take the top k
+    def run(user):
+        scores = engine.score(user)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+    return run
+
+
+def typo(title, rng):
+    i = rng.integers(0, len(title))
+    return title[:i] + title[i + 1:]
+
+
+def bench_search(catalog, n_queries, seed=0):
+    """Index build time, then latency of type-ahead prefixes and one-typo queries."""
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    catalog.title_index()
+    results = {"build_seconds": round(time.perf_counter() - started, 3)}
+    titles = [catalog.titles[i] for i in rng.integers(0, len(catalog), n_queries)]
+    queries = {
+        "prefix": [t[:rng.integers(1, len(t) + 1)] for t in titles],
+        "typo": [typo(t, rng) for t in titles],
+    }
+    for kind, batch in queries.items():
+        found = 0
+        times = []
+        for query, title in zip(batch, titles):
+            started = time.perf_counter()
+            hits = catalog.search(query)
+            times.append(time.perf_counter() - started)
+            found += any(catalog.titles[i] == title for i, _ in hits)
+        results[kind] = dict(percentiles(times), found=round(found / len(titles), 3))
+    return results
+
+
+def bench_ingest(catalog, users, n_events, workdir, seed=0):
+    """Events per second through the streaming ingester, committing to a fresh profile store."""
+    rng = np.random.default_rng(seed)
+    path = os.path.join(workdir, f"events-{len(catalog)}.jsonl")
+    emails = [u.email for u in users]
+    # popularity is heavily skewed, like real viewing
+    movies = (rng.zipf(1.3, n_events) - 1) % len(catalog)
+    with open(path, "w") as f:
+        for user, movie in zip(rng.integers(0, len(users), n_events).tolist(), movies.tolist()):
+            f.write(json.dumps({"email": emails[user], "movie_id": movie}) + "\n")
+    store = ProfileStore(os.path.join(workdir, f"ingest-{len(catalog)}.db"))
+    ingestor = Ingestor(catalog, store)
+    started = time.perf_counter()
+    ingestor.ingest_files([path])
+    elapsed = time.perf_counter() - started
+    store.close()
+    return dict(ingestor.summary(), events_per_second=round(n_events / elapsed, 1))
+
+
+def bench_size(n, n_users, k, workdir, seed=0):
+    results = []
+    record = lambda name, **metrics: results.append(dict({"benchmark": name, "catalog_size": n}, **metrics))
+
+    started = time.perf_counter()
+    catalog = synthetic_catalog(n, seed)
+    users = synthetic_users(catalog, n_users, seed)
+    record("generate", seconds=round(time.perf_counter() - started, 3))
+
+    path = os.path.join(workdir, f"synthetic-{n}.cmcat")
+    started = time.perf_counter()
+    write_catalog(catalog, path)
+    record("catalog_write", seconds=round(time.perf_counter() - started, 3), file_mb=round(os.path.getsize(path) / 2**20, 1))
+
+    started = time.perf_counter()
+    catalog = open_catalog(path)
+    opened = time.perf_counter()
+    recommender = Recommender(catalog, cache_size=max(1024, n_users))
+    ready = time.perf_counter()
+    record("startup", open_ms=round((opened - started) * 1000, 3), index_ms=round((ready - opened) * 1000, 3))
+
+    engine = recommender.scorer
+    watched = {u.email: catalog.watched_set(u.watched_movies) for u in users}
+    scorers = {
+        "full_scan": full_scan(engine, k),
+        "genre_index": lambda u: engine.top_k(u, k, watched[u.email]),
+        "genre_index_filtered": lambda u: engine.top_k(u, k, watched[u.email], filters=FILTERS),
+        # the first pass over the users fills the cache, the second hits it
+        "cache_miss": lambda u: recommender.recommend(u, k, watched[u.email]),
+        "cached": lambda u: recommender.recommend(u, k, watched[u.email]),
+    }
+    for name, fn in scorers.items():
+        record("single_user", scorer=name, **measure(fn, users))
+
+    # each user marks their current top pick watched, a few times in a row
+    updates = []
+    for u in users:
+        ranking = recommender.ranking(u, k, watched[u.email])
+        for _ in range(5):
+            top = ranking.top()
+            if not top:
+                break
+            u = UserProfile(u.genres, u.age, u.watched_movies + [catalog.titles[top[0].movie_id]], u.email)
+            started = time.perf_counter()
+            ranking.update(u)
+            updates.append(time.perf_counter() - started)
+    record("mark_watched", updates=len(updates), **percentiles(updates))
+
+    started = time.perf_counter()
+    for start in range(0, len(users), 64):
+        engine.top_k_batch(users[start:start + 64], k)
+    elapsed = time.perf_counter() - started
+    record("batch", users=len(users), users_per_second=round(len(users) / elapsed, 1))
+
+    record("title_search", **bench_search(catalog, n_users, seed))
+    record("ingest", **bench_ingest(catalog, users, 200000, workdir, seed))
+
+    store_path = os.path.join(workdir, f"profiles-{n}.db")
+    store = ProfileStore(store_path)
+    for u in users:
+        store.put({"email": u.email, "name": u.email, "age": u.age, "genres": u.genres, "bio": "",
+                   "password": "secret", "watched_movies": u.watched_movies,
+                   "registration_date": "2025-01-01", "preferred_theme": "Cinematic"})
+    record("profile_load", **measure(lambda u: store.get(u.email), users))
+    store.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation engine on synthetic data")
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma separated catalog sizes, e.g. 10000,100000,1000000,10000000")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--out", help="append JSONL results here (default: stdout)")
+    args = parser.parse_args()
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    out = open(args.out, "a") if args.out else sys.stdout
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            for result in bench_size(size, args.users, args.k, workdir):
+                out.write(json.dumps(dict(run, **result)) + "\n")
+                out.flush()
+    # ru_maxrss is in KiB on Linux
+    peak_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    out.write(json.dumps(dict(run, benchmark="process", peak_rss_mb=peak_mb)) + "\n")
+    if args.out:
+        out.close()
@@ -0,0 +1,85 @@
+import hashlib
+
+import numpy as np
+
+# to_bytes() tags
+_SPARSE = b"I"
+_DENSE = b"B"
+
+
+class WatchedSet:
+    """Set of catalog movie ids stored as a bitset, one bit per movie."""
+
+    def __init__(self, size, words=None):
+        self.size = size
+        n_words = (size + 63) // 64
+        self.words = np.zeros(n_words, dtype=np.uint64) if words is None else words
+
+    @classmethod
+    def from_ids(cls, size, ids):
+        watched = cls(size)
+        watched.update(ids)
+        return watched
+
+    @classmethod
+    def from_bytes(cls, size, data):
+        """Decode to_bytes() output (or an untagged bitset from before it had a sparse form)."""
+        n_words = (size + 63) // 64
+        tag, body = data[:1], data[1:]
+        if len(data) % 2 == 0:
+            tag, body = _DENSE, data
+        if tag == _SPARSE and len(body) % 4 == 0:
+            ids = np.frombuffer(body, dtype="<u4")
+            if len(ids) and ids[-1] >= size:
+                raise ValueError("Watched ids do not match the catalog size")
+            return cls.from_ids(size, ids)
+        if tag != _DENSE or len(body) != n_words * 8:
+            raise ValueError("Watched bitset does not match the catalog size")
+        return cls(size, np.frombuffer(body, dtype="<u8").astype(np.uint64))
+
+    def to_bytes(self):
+        """Compact encoding: sorted uint32 ids while that is smaller than the bitset, else the bitset.
+
+        A tag byte tells the two apart; it also makes every encoding an odd
+        number of bytes, unlike the untagged bitsets written before.
+        """
+        ids = self.ids()
+        if len(ids) * 4 < self.words.nbytes:
+            return _SPARSE + ids.astype("<u4").tobytes()
+        return _DENSE + self.words.astype("<u8").tobytes()
+
+    def copy(self):
+        return WatchedSet(self.size, self.words.copy())
+
+    def add(self, movie_id):
+        self.words[movie_id >> 6] |= np.uint64(1) << np.uint64(movie_id & 63)
+
+    def update(self, ids):
+        ids = np.asarray(ids, dtype=np.uint64)
+        if len(ids):
+            np.bitwise_or.at(self.words, ids >> np.uint64(6), np.uint64(1) << (ids & np.uint64(63)))
+
+    def discard(self, movie_id):
+        self.words[movie_id >> 6] &= ~(np.uint64(1) << np.uint64(movie_id & 63))
+
+    def __contains__(self, movie_id):
+        return bool((self.words[movie_id >> 6] >> np.uint64(movie_id & 63)) & np.uint64(1))
+
+    def contains_many(self, ids):
+        """Vectorized membership test, returns a bool array aligned with ids."""
+        ids = np.asarray(ids, dtype=np.uint64)
+        return ((self.words[ids >> np.uint64(6)] >> (ids & np.uint64(63))) & np.uint64(1)).astype(bool)
+
+    def mask(self):
+        """Dense bool mask over the whole catalog."""
+        bits = np.unpackbits(self.words.astype("<u8").view(np.uint8), bitorder="little")
+        return bits[:self.size].astype(bool)
+
+    def ids(self):
+        return np.flatnonzero(self.mask())
+
+    def __len__(self):
+        return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
+    def fingerprint(self):
+        return hashlib.blake2b(self.words.tobytes(), digest_size=16).hexdigest()
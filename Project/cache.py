@@ -0,0 +1,64 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from scoring import MINOR_AGE
+
+
+def profile_key(profile, k, catalog_version, watched_fingerprint, filters=None):
+    """Hash of everything the deterministic ranking depends on."""
+    relevant = [
+        sorted(profile["genres"]),
+        # age only matters through the under-18 penalty
+        profile["age"] < MINOR_AGE,
+        watched_fingerprint,
+        k,
+        catalog_version,
+        filters.key() if filters else None,
+    ]
+    return hashlib.sha1(json.dumps(relevant).encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """Thread-safe LRU cache with a per-entry time to live and hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if self.ttl is None or expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
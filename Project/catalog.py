@@ -0,0 +1,176 @@
+import csv
+import json
+import os
+import struct
+
+import numpy as np
+
+from scoring import MovieCatalog
+
+# Built-in catalog used when no external catalog file is configured
+DEFAULT_MOVIES = [
+    {"title": "Inception", "genres": ["Sci-Fi", "Action"], "rating": 8.8, "year": 2010, "duration": 148},
+    {"title": "The Shawshank Redemption", "genres": ["Drama"], "rating": 9.3, "year": 1994, "duration": 142},
+    {"title": "Pulp Fiction", "genres": ["Crime", "Drama"], "rating": 8.9, "year": 1994, "duration": 154},
+    {"title": "The Dark Knight", "genres": ["Action", "Crime", "Drama"], "rating": 9.0, "year": 2008, "duration": 152},
+    {"title": "Fight Club", "genres": ["Drama"], "rating": 8.8, "year": 1999, "duration": 139},
+    {"title": "Forrest Gump", "genres": ["Drama", "Romance"], "rating": 8.8, "year": 1994, "duration": 142},
+    {"title": "The Matrix", "genres": ["Action", "Sci-Fi"], "rating": 8.7, "year": 1999, "duration": 136},
+    {"title": "Goodfellas", "genres": ["Crime", "Drama"], "rating": 8.7, "year": 1990, "duration": 146},
+    {"title": "The Silence of the Lambs", "genres": ["Crime", "Thriller"], "rating": 8.6, "year": 1991, "duration": 118},
+    {"title": "Interstellar", "genres": ["Adventure", "Drama", "Sci-Fi"], "rating": 8.6, "year": 2014, "duration": 169},
+]
+
+CATALOG_SUFFIX = ".cmcat"
+MAGIC = b"CINECAT1"
+FORMAT_VERSION = 1
+
+# magic, version, movies, genres, then (offset, byte length) for each section
+SECTIONS = ["rating", "year", "duration", "genres", "title_offsets", "title_blob", "genre_offsets", "genre_blob"]
+HEADER = struct.Struct("<8sIQI" + "QQ" * len(SECTIONS))
+
+
+class StringTable:
+    """Interned strings stored as one UTF-8 blob plus an offsets array."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, blob)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def load_records(path):
+    """Read movie dicts from a .csv or .jsonl file."""
+    records = []
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                records.append({
+                    "title": row["title"],
+                    "genres": [g.strip() for g in row["genres"].split("|") if g.strip()],
+                    "rating": float(row["rating"]),
+                    "year": int(row["year"]),
+                    "duration": int(row["duration"]),
+                })
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    else:
+        raise ValueError(f"Unsupported catalog format: {path}")
+    return records
+
+
+def _write_section(f, array):
+    # every section starts on an 8 byte boundary so it can be viewed in place
+    pad = -f.tell() % 8
+    f.write(b"\0" * pad)
+    offset = f.tell()
+    data = np.ascontiguousarray(array).tobytes()
+    f.write(data)
+    return offset, len(data)
+
+
+def write_catalog(catalog, path):
+    titles = catalog.titles
+    if not isinstance(titles, StringTable):
+        titles = StringTable.from_strings(titles)
+    genres = StringTable.from_strings(catalog.genre_names)
+
+    columns = {
+        "rating": catalog.rating.astype("<f4"),
+        "year": catalog.year.astype("<i2"),
+        "duration": catalog.duration.astype("<i2"),
+        "genres": catalog.genre_matrix.astype(np.uint8),
+        "title_offsets": titles.offsets.astype("<u8"),
+        "title_blob": titles.blob,
+        "genre_offsets": genres.offsets.astype("<u8"),
+        "genre_blob": genres.blob,
+    }
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        spans = []
+        for name in SECTIONS:
+            spans.extend(_write_section(f, columns[name]))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(catalog), len(catalog.genre_names), *spans))
+    os.replace(tmp_path, path)
+
+
+def open_catalog(path):
+    """Memory-map a .cmcat file; columns are read-only views into the mapping."""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, n, n_genres, *spans = HEADER.unpack_from(buf[:HEADER.size].tobytes())
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a CineMate catalog file")
+
+    dtypes = {
+        "rating": "<f4", "year": "<i2", "duration": "<i2", "genres": np.uint8,
+        "title_offsets": "<u8", "title_blob": np.uint8,
+        "genre_offsets": "<u8", "genre_blob": np.uint8,
+    }
+    sections = {}
+    for i, name in enumerate(SECTIONS):
+        offset, length = spans[2 * i], spans[2 * i + 1]
+        sections[name] = buf[offset:offset + length].view(dtypes[name])
+
+    genre_names = list(StringTable(sections["genre_offsets"], sections["genre_blob"]))
+    stat = os.stat(path)
+    return MovieCatalog(
+        titles=StringTable(sections["title_offsets"], sections["title_blob"]),
+        genre_names=genre_names,
+        genre_matrix=sections["genres"].reshape(n, n_genres),
+        rating=sections["rating"],
+        year=sections["year"],
+        duration=sections["duration"],
+        version=f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}",
+    )
+
+
+def compiled_path(path):
+    return os.path.splitext(path)[0] + CATALOG_SUFFIX
+
+
+def load_catalog(path=None):
+    """Open a catalog, converting CSV/JSONL sources to the columnar format once."""
+    if path is None:
+        return MovieCatalog.from_records(DEFAULT_MOVIES, version="builtin-1")
+    if path.endswith(CATALOG_SUFFIX):
+        return open_catalog(path)
+
+    target = compiled_path(path)
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(path):
+        write_catalog(MovieCatalog.from_records(load_records(path)), target)
+    return open_catalog(target)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("usage: python catalog.py <movies.csv|movies.jsonl>")
+        sys.exit(1)
+    src = sys.argv[1]
+    write_catalog(MovieCatalog.from_records(load_records(src)), compiled_path(src))
+    print(f"Wrote {compiled_path(src)}")
@@ -0,0 +1,116 @@
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+
+# A user's strongest co-watch signal is worth as much as one matched genre
+CF_POINTS = 30
+
+
+def interaction_matrix(histories, n_items):
+    """Binary users x items CSR matrix from lists of watched movie ids."""
+    indptr = [0]
+    indices = []
+    for ids in histories:
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        indices.append(ids)
+        indptr.append(indptr[-1] + len(ids))
+    indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+    data = np.ones(len(indices), dtype=np.float32)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(histories), n_items))
+
+
+def load_histories(store, catalog):
+    """Watched movie ids per user from a ProfileStore, dropping titles not in the catalog."""
+    histories = {}
+    for email, title in store.iter_watched():
+        movie_id = catalog.find(title)
+        if movie_id is not None:
+            histories.setdefault(email, []).append(movie_id)
+    return histories
+
+
+class ItemNeighbors:
+    """Top-N most similar items per movie (cosine over co-watch columns)."""
+
+    def __init__(self, neighbors, similarities):
+        self.neighbors = neighbors  # (items, N) int32, -1 pads short rows
+        self.similarities = similarities  # (items, N) float32
+
+    @classmethod
+    def build(cls, interactions, top_n=20, block_size=4096):
+        n_items = interactions.shape[1]
+        items = interactions.T.tocsr()  # items x users
+        norms = np.sqrt(np.asarray(items.sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+
+        neighbors = np.full((n_items, top_n), -1, dtype=np.int32)
+        similarities = np.zeros((n_items, top_n), dtype=np.float32)
+        # item x item co-counts are computed a block of rows at a time to bound memory
+        for start in range(0, n_items, block_size):
+            stop = min(start + block_size, n_items)
+            block = (items[start:stop] @ interactions).tocsr()
+            for row in range(stop - start):
+                item = start + row
+                lo, hi = block.indptr[row], block.indptr[row + 1]
+                cols = block.indices[lo:hi]
+                sims = block.data[lo:hi] / (norms[item] * norms[cols])
+                keep = cols != item
+                cols, sims = cols[keep], sims[keep]
+                if len(cols) > top_n:
+                    top = np.argpartition(-sims, top_n - 1)[:top_n]
+                    cols, sims = cols[top], sims[top]
+                order = np.argsort(-sims, kind="stable")
+                neighbors[item, :len(cols)] = cols[order]
+                similarities[item, :len(cols)] = sims[order]
+        return cls(neighbors, similarities)
+
+    def save(self, path):
+        np.savez(path, neighbors=self.neighbors, similarities=self.similarities)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["neighbors"], data["similarities"])
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def scores(self, history):
+        """Merge the neighbor lists of a user's history into (movie ids, summed similarity)."""
+        history = np.asarray(history, dtype=np.int64)
+        if len(history) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = self.neighbors[history].ravel()
+        sims = self.similarities[history].ravel()
+        valid = ids >= 0
+        ids, inverse = np.unique(ids[valid], return_inverse=True)
+        return ids.astype(np.int64), np.bincount(inverse, weights=sims[valid]).astype(np.float32)
+
+    def boost(self, history):
+        """Collaborative points per movie, scaled so the strongest candidate gets CF_POINTS."""
+        ids, sims = self.scores(history)
+        if len(ids) == 0 or sims.max() <= 0:
+            return ids, sims
+        return ids, sims * (CF_POINTS / sims.max())
+
+
+if __name__ == "__main__":
+    from catalog import load_catalog
+    from profile_store import ProfileStore
+
+    parser = argparse.ArgumentParser(description="Precompute item-item neighbors from watch histories")
+    parser.add_argument("--catalog", help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--db", default="cinemate.db", help="profile store with the watch histories")
+    parser.add_argument("--out", default="neighbors.npz")
+    parser.add_argument("--top-n", type=int, default=20)
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.catalog)
+    store = ProfileStore(args.db)
+    histories = load_histories(store, catalog)
+    store.close()
+
+    table = ItemNeighbors.build(interaction_matrix(list(histories.values()), len(catalog)), args.top_n)
+    table.save(args.out)
+    print(f"Wrote neighbors for {len(table)} movies from {len(histories)} users to {args.out}")
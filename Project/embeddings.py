@@ -0,0 +1,201 @@
+import argparse
+import time
+
+import numpy as np
+
+# Rows handled per matrix product when assigning vectors to lists
+ASSIGN_BLOCK = 65536
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def _assign(vectors, centroids):
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = vectors[start:start + ASSIGN_BLOCK]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """Spherical k-means (cosine) with Lloyd iterations."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=n_clusters) == 0
+        # re-seed empty clusters from random points so every list stays useful
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class EmbeddingIndex:
+    """Low-dimensional movie vectors plus an IVF index over them.
+
+    Vectors are the PCA projection of [genre multi-hot | rating | co-watch SVD factors].
+    The IVF index groups them under k-means centroids; a query only scans the
+    nprobe lists whose centroids are closest to it.
+    """
+
+    def __init__(self, components, mean, n_genres, vectors, centroids, list_offsets, list_ids):
+        self.components = components  # (features, dim) PCA projection
+        self.mean = mean  # (features,)
+        self.n_genres = n_genres
+        self.vectors = vectors  # (movies, dim), unit length, stored in list order
+        self.centroids = centroids  # (lists, dim)
+        self.list_offsets = list_offsets  # (lists + 1,) into list_ids
+        self.list_ids = list_ids  # movie ids grouped by list
+        self.rows = np.empty(len(list_ids), dtype=np.int64)  # movie id -> row in vectors
+        self.rows[list_ids] = np.arange(len(list_ids))
+
+    @classmethod
+    def build(cls, catalog, interactions=None, dim=16, cowatch_dim=16, n_lists=None, sample_size=100000, seed=0):
+        rating = catalog.rating.astype(np.float32)[:, None] / 10
+        features = np.hstack([catalog.genre_matrix.astype(np.float32), rating])
+        if interactions is not None and interactions.nnz:
+            from scipy.sparse.linalg import svds
+            k = max(1, min(cowatch_dim, min(interactions.shape) - 1))
+            _, s, vt = svds(interactions.astype(np.float32), k=k)
+            features = np.hstack([features, (vt.T * s).astype(np.float32)])
+
+        # PCA through the small features x features covariance matrix
+        mean = features.mean(axis=0)
+        centered = features - mean
+        eigvals, eigvecs = np.linalg.eigh(centered.T @ centered)
+        dim = min(dim, features.shape[1])
+        components = eigvecs[:, np.argsort(eigvals)[::-1][:dim]].astype(np.float32)
+        vectors = _normalize(centered @ components)
+
+        n = len(vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, min(n, max(sample_size, n_lists)), replace=False)]
+        centroids = kmeans(sample, n_lists, seed=seed)
+
+        labels = _assign(vectors, centroids)
+        list_ids = np.argsort(labels, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(components, mean, catalog.genre_matrix.shape[1], vectors[list_ids], centroids, list_offsets, list_ids)
+
+    def save(self, path):
+        np.savez(path, components=self.components, mean=self.mean, n_genres=self.n_genres,
+                 vectors=self.vectors, centroids=self.centroids,
+                 list_offsets=self.list_offsets, list_ids=self.list_ids)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["components"], data["mean"], int(data["n_genres"]), data["vectors"],
+                       data["centroids"], data["list_offsets"], data["list_ids"])
+
+    def __len__(self):
+        return len(self.list_ids)
+
+    def movie_vectors(self, ids):
+        return self.vectors[self.rows[ids]]
+
+    def user_vector(self, genre_ids, history=()):
+        """Project the user's genres into the embedding space and mix in their history."""
+        features = np.zeros(len(self.mean), dtype=np.float32)
+        features[:self.n_genres][list(genre_ids)] = 1
+        features[self.n_genres] = 1  # prefer the best rated titles
+        vector = _normalize((features - self.mean) @ self.components)
+        if len(history):
+            vector = vector + self.movie_vectors(np.asarray(history)).mean(axis=0)
+        return _normalize(vector)
+
+    def search(self, query, k=10, nprobe=8):
+        """Approximate top-k movie ids by cosine similarity to query."""
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([np.arange(self.list_offsets[l], self.list_offsets[l + 1]) for l in lists])
+        scores = self.vectors[rows] @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores)
+        return self.list_ids[rows[order]], scores[order]
+
+    def exact_search(self, query, k=10):
+        scores = self.vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self.list_ids[top], scores[top]
+
+
+def benchmark(index, queries, k=10, nprobe=8):
+    """Recall@k and latency of the IVF search against exact brute force.
+
+    Many movies share a genre set and so have identical vectors; a result
+    counts as recalled when it scores at least as high as the exact k-th hit.
+    """
+    recalls, ann_times, exact_times = [], [], []
+    for query in queries:
+        t = time.perf_counter()
+        _, approx_scores = index.search(query, k, nprobe)
+        ann_times.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        _, exact_scores = index.exact_search(query, k)
+        exact_times.append(time.perf_counter() - t)
+        recalls.append(np.sum(approx_scores >= exact_scores[-1] - 1e-6) / k)
+    ms = lambda times, q: round(float(np.percentile(times, q)) * 1000, 3)
+    return {
+        "movies": len(index), "lists": len(index.centroids), "k": k, "nprobe": nprobe,
+        "recall": round(float(np.mean(recalls)), 4),
+        "ann_p50_ms": ms(ann_times, 50), "ann_p99_ms": ms(ann_times, 99),
+        "exact_p50_ms": ms(exact_times, 50), "exact_p99_ms": ms(exact_times, 99),
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    from catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description="Build or benchmark the movie embedding ANN index")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--catalog", help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--db", help="profile store whose watch histories add co-watch features")
+    parser.add_argument("--out", default="ann.npz")
+    parser.add_argument("--dim", type=int, default=16)
+    parser.add_argument("--lists", type=int, help="IVF lists (default: sqrt of catalog size)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.catalog)
+    interactions = None
+    if args.db:
+        from collaborative import interaction_matrix, load_histories
+        from profile_store import ProfileStore
+
+        store = ProfileStore(args.db)
+        histories = load_histories(store, catalog)
+        store.close()
+        interactions = interaction_matrix(list(histories.values()), len(catalog))
+
+    started = time.perf_counter()
+    index = EmbeddingIndex.build(catalog, interactions, dim=args.dim, n_lists=args.lists)
+    build_seconds = time.perf_counter() - started
+
+    if args.command == "build":
+        index.save(args.out)
+        print(f"Indexed {len(index)} movies in {build_seconds:.1f}s, wrote {args.out}")
+    else:
+        rng = np.random.default_rng(1)
+        genres = [rng.choice(len(catalog.genre_names), size=rng.integers(1, 4), replace=False)
+                  for _ in range(args.queries)]
+        queries = [index.user_vector(g) for g in genres]
+        result = benchmark(index, queries, args.k, args.nprobe)
+        result["build_seconds"] = round(build_seconds, 2)
+        print(json.dumps(result))
@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Catalog columns that can be filtered on, in cache-key order
+FACETS = ("year", "duration", "rating")
+
+
+def _bound(value, dtype, upper):
+    """value in the column's dtype; fractional bounds round inwards on integer columns."""
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        value = min(max(np.floor(value) if upper else np.ceil(value), info.min), info.max)
+    return np.asarray(value, dtype=dtype)
+
+
+class Filters:
+    """Inclusive range constraints on year, duration and rating; None leaves a side open."""
+
+    __slots__ = ("ranges",)
+
+    def __init__(self, min_year=None, max_year=None, min_duration=None, max_duration=None,
+                 min_rating=None, max_rating=None):
+        bounds = {
+            "year": (min_year, max_year),
+            "duration": (min_duration, max_duration),
+            "rating": (min_rating, max_rating),
+        }
+        self.ranges = {
+            name: (lo, hi) for name, (lo, hi) in bounds.items() if lo is not None or hi is not None
+        }
+        for name, (lo, hi) in self.ranges.items():
+            if lo is not None and hi is not None and lo > hi:
+                raise ValueError(f"Empty {name} range: {lo} > {hi}")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Filters from e.g. {"max_duration": 120, "min_year": 2000}; unknown keys are an error."""
+        data = data or {}
+        allowed = {f"{side}_{name}" for name in FACETS for side in ("min", "max")}
+        unknown = set(data) - allowed
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        return cls(**{key: None if value is None else float(value) for key, value in data.items()})
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def key(self):
+        """Hashable, JSON-friendly form for cache keys."""
+        return [[name, *self.ranges[name]] for name in FACETS if name in self.ranges]
+
+    def matches(self, catalog, ids):
+        """Boolean mask of which movie ids satisfy every constraint."""
+        # for large id sets a contiguous pass over the whole column beats gathering
+        dense = len(ids) > len(catalog) // 8
+        keep = np.ones(len(catalog) if dense else len(ids), dtype=bool)
+        for name, (lo, hi) in self.ranges.items():
+            column = getattr(catalog, name)
+            values = column if dense else column[ids]
+            if lo is not None:
+                keep &= values >= _bound(lo, column.dtype, upper=False)
+            if hi is not None:
+                keep &= values <= _bound(hi, column.dtype, upper=True)
+        return keep[ids] if dense else keep
+
+
+class FacetIndex:
+    """Each filterable column sorted once, so a range becomes two binary searches."""
+
+    # whole-catalog masks kept for recently used filters (1 byte per movie each)
+    mask_cache_size = 16
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.masks = OrderedDict()
+        self.lock = threading.Lock()
+        self.columns = {}
+        for name in FACETS:
+            values = getattr(catalog, name)
+            order = np.argsort(values, kind="stable")
+            self.columns[name] = (order, values[order])
+
+    def span(self, name, lo, hi):
+        """(start, stop) positions of [lo, hi] in the sorted column."""
+        _, values = self.columns[name]
+        start = 0 if lo is None else np.searchsorted(values, _bound(lo, values.dtype, upper=False), side="left")
+        stop = len(values) if hi is None else np.searchsorted(values, _bound(hi, values.dtype, upper=True), side="right")
+        return int(start), max(int(start), int(stop))
+
+    def estimate(self, filters):
+        """Upper bound on matching movies: the size of the most selective range."""
+        sizes = [stop - start for start, stop in (self.span(n, *r) for n, r in filters.ranges.items())]
+        return min(sizes, default=len(self.catalog))
+
+    def select(self, filters):
+        """Sorted ids of the movies matching every constraint.
+
+        Only the most selective column is read through its index; the
+        remaining constraints are checked on that (small) slice directly.
+        """
+        if not filters:
+            return np.arange(len(self.catalog), dtype=np.int64)
+        spans = {name: self.span(name, *bounds) for name, bounds in filters.ranges.items()}
+        name = min(spans, key=lambda n: spans[n][1] - spans[n][0])
+        start, stop = spans[name]
+        ids = np.sort(self.columns[name][0][start:stop]).astype(np.int64)
+        if len(spans) > 1:
+            ids = ids[filters.matches(self.catalog, ids)]
+        return ids
+
+    def mask(self, filters):
+        """Boolean mask over the whole catalog of the movies matching filters.
+
+        Broad filters are cheaper to apply as one lookup into this mask than
+        by comparing column values per candidate, and the same few filters
+        tend to be reused, so recent masks are cached.
+        """
+        key = repr(filters.key())
+        with self.lock:
+            mask = self.masks.get(key)
+            if mask is not None:
+                self.masks.move_to_end(key)
+                return mask
+        mask = np.zeros(len(self.catalog), dtype=bool)
+        mask[self.select(filters)] = True
+        mask.flags.writeable = False
+        with self.lock:
+            self.masks[key] = mask
+            while len(self.masks) > self.mask_cache_size:
+                self.masks.popitem(last=False)
+        return mask
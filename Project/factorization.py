@@ -0,0 +1,159 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class ImplicitALS:
+    """Alternating least squares for implicit feedback (Hu, Koren & Volinsky).
+
+    Every watched movie is a positive with confidence 1 + alpha; unwatched
+    ones are weak negatives. Each half-step solves one small factors x factors
+    system per user (or item), stacked into batched np.linalg.solve calls over
+    blocks of rows that run on a thread pool (NumPy releases the GIL there).
+    """
+
+    def __init__(self, factors=32, regularization=0.1, alpha=40.0, iterations=10, threads=4, seed=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.threads = threads
+        self.seed = seed
+        self.user_factors = None
+        self.item_factors = None
+        self._gram = None  # item gram matrix reused by fold_in until the next fit
+
+    def fit(self, interactions):
+        """Train on a users x items CSR matrix of watch counts."""
+        interactions = sp.csr_matrix(interactions, dtype=np.float32)
+        items = interactions.T.tocsr()
+        rng = np.random.default_rng(self.seed)
+        n_users, n_items = interactions.shape
+        self.user_factors = (rng.standard_normal((n_users, self.factors)) * 0.01).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        with ThreadPoolExecutor(self.threads) as pool:
+            for _ in range(self.iterations):
+                self._solve_all(pool, interactions, self.user_factors, self.item_factors)
+                self._solve_all(pool, items, self.item_factors, self.user_factors)
+        self._gram = None
+        return self
+
+    def _solve_all(self, pool, matrix, target, fixed):
+        gram = fixed.T @ fixed  # shared by every row, computed once per half-step
+        jobs = [
+            pool.submit(self._solve_block, matrix, target, fixed, gram, start, stop)
+            for start, stop in self._blocks(matrix.indptr)
+        ]
+        for job in jobs:
+            job.result()
+
+    def _blocks(self, indptr):
+        # rows are grouped so a block's stacked outer products (one per watched
+        # entry) and per-row systems stay around 16 MB together
+        budget = max(1, (4 << 20) // (self.factors * self.factors))
+        n_rows = len(indptr) - 1
+        cost = indptr + np.arange(n_rows + 1)  # entries plus rows up to each row
+        start = 0
+        while start < n_rows:
+            stop = int(np.searchsorted(cost, cost[start] + budget, side="right")) - 1
+            stop = min(max(stop, start + 1), n_rows)
+            yield start, stop
+            start = stop
+
+    def _solve_block(self, matrix, target, fixed, gram, start, stop):
+        """Solve (Y^T C Y + reg I) x = Y^T C p for every row in [start, stop) at once."""
+        filled = np.flatnonzero(np.diff(matrix.indptr[start:stop + 1]) > 0)
+        # a row with no entries has b = 0, so its solution is exactly zero
+        target[start:stop] = 0
+        if not len(filled):
+            return
+        lo, hi = matrix.indptr[start], matrix.indptr[stop]
+        indices, counts = matrix.indices[lo:hi], matrix.data[lo:hi]
+        row_starts = matrix.indptr[start:stop][filled] - lo
+
+        confidence = 1 + self.alpha * counts
+        observed = fixed[indices]
+        a = np.repeat(gram[None], len(filled), axis=0)
+        a[:, np.arange(self.factors), np.arange(self.factors)] += self.regularization
+        # C - I is only non-zero on watched entries, so only those add to the gram matrix
+        outer = (observed * (confidence - 1)[:, None])[:, :, None] * observed[:, None, :]
+        a += np.add.reduceat(outer, row_starts, axis=0)
+        b = np.add.reduceat(observed * confidence[:, None], row_starts, axis=0)
+        target[start + filled] = np.linalg.solve(a, b[:, :, None])[:, :, 0]
+
+    def fold_in(self, history, counts=None):
+        """Factor vector for a user from their watched item ids, without retraining."""
+        history = np.asarray(history, dtype=np.int64)
+        counts = np.ones(len(history), dtype=np.float32) if counts is None else np.asarray(counts, dtype=np.float32)
+        row = sp.csr_matrix((counts, history, [0, len(history)]), shape=(1, len(self.item_factors)))
+        vector = np.zeros((1, self.factors), dtype=np.float32)
+        if self._gram is None:
+            self._gram = self.item_factors.T @ self.item_factors
+        self._solve_block(row, vector, self.item_factors, self._gram, 0, 1)
+        return vector[0]
+
+    def partial_update(self, user, history):
+        """Refresh one known user's vector after they marked another movie watched."""
+        self.user_factors[user] = self.fold_in(history)
+        return self.user_factors[user]
+
+    def scores(self, user_vector):
+        return self.item_factors @ user_vector
+
+    def recommend(self, user_vector, k=5, exclude=(), items=None):
+        """Top-k item ids and scores; items, if given, limits the search to those ids."""
+        exclude = np.asarray(exclude, dtype=np.int64)
+        if items is None:
+            scores = self.scores(user_vector)
+            scores[exclude] = -np.inf
+        else:
+            items = np.asarray(items, dtype=np.int64)
+            scores = self.item_factors[items] @ user_vector
+            scores[np.isin(items, exclude)] = -np.inf
+        k = min(k, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), scores[:0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (top if items is None else items[top]), scores[top]
+
+    def save(self, path):
+        np.savez(path, user_factors=self.user_factors, item_factors=self.item_factors,
+                 params=np.array([self.factors, self.regularization, self.alpha], dtype=np.float64))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            factors, regularization, alpha = data["params"]
+            model = cls(int(factors), float(regularization), float(alpha))
+            model.user_factors = data["user_factors"]
+            model.item_factors = data["item_factors"]
+        return model
+
+
+if __name__ == "__main__":
+    from catalog import load_catalog
+    from collaborative import interaction_matrix, load_histories
+    from profile_store import ProfileStore
+
+    parser = argparse.ArgumentParser(description="Train an implicit ALS model on watch histories")
+    parser.add_argument("--catalog", help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--db", default="cinemate.db", help="profile store with the watch histories")
+    parser.add_argument("--out", default="model.npz")
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.catalog)
+    store = ProfileStore(args.db)
+    histories = load_histories(store, catalog)
+    store.close()
+
+    model = ImplicitALS(args.factors, iterations=args.iterations, threads=args.threads)
+    model.fit(interaction_matrix(list(histories.values()), len(catalog)))
+    model.save(args.out)
+    print(f"Trained {args.factors} factors for {len(histories)} users x {len(catalog)} movies, wrote {args.out}")
@@ -0,0 +1,35 @@
+import numpy as np
+
+
+class GenreIndex:
+    """Inverted index from genre id to the sorted ids of movies in that genre."""
+
+    def __init__(self, catalog):
+        self.size = len(catalog)
+        self.postings = [
+            np.flatnonzero(catalog.genre_matrix[:, g]).astype(np.int64)
+            for g in range(len(catalog.genre_names))
+        ]
+
+    def candidates(self, genre_ids, allowed=None):
+        """Sorted ids of the movies sharing at least one genre.
+
+        allowed is an optional boolean mask over the catalog; movies outside
+        it are dropped.
+        """
+        lists = [self.postings[g] for g in genre_ids]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        if len(lists) == 1:
+            ids = lists[0]
+            if allowed is not None:
+                ids = ids[allowed[ids]]
+            return ids
+        # a membership mask is O(catalog) but much cheaper than sorting
+        # the concatenated postings once the lists get long
+        taken = np.zeros(self.size, dtype=bool)
+        for postings in lists:
+            taken[postings] = True
+        if allowed is not None:
+            taken &= allowed
+        return np.flatnonzero(taken)
@@ -0,0 +1,397 @@
+import argparse
+import json
+import queue
+import socketserver
+import sys
+import threading
+import time
+from operator import itemgetter
+
+import numpy as np
+
+from instrumentation import metrics
+
+
+def read_lines(stream, size=1 << 16):
+    """Lists of the complete lines in a binary stream, each as soon as a read returns it.
+
+    read1 returns whatever is buffered or arrives in one read, so a socket
+    hands over a few events without waiting for a full buffer.
+    """
+    rest = b""
+    while True:
+        data = stream.read1(size)
+        if not data:
+            break
+        lines = (rest + data).split(b"\n")
+        rest = lines.pop()
+        if lines:
+            yield lines
+    if rest:
+        yield [rest]
+
+
+def micro_batches(chunks, size=20000, max_delay=0.2):
+    """Regroup lists of items into batches of up to size, or whatever arrived within max_delay.
+
+    chunks is iterated on its own thread and the delay runs on a timer, so
+    a partial batch is flushed even while the source is idle.
+    """
+    pending = queue.Queue(16)
+    done = object()
+    errors = []
+
+    def read():
+        try:
+            for chunk in chunks:
+                pending.put(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pending.put(done)
+
+    threading.Thread(target=read, name="ingest-batcher", daemon=True).start()
+    batch = []
+    deadline = None
+    while True:
+        try:
+            chunk = pending.get(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            yield batch
+            batch, deadline = [], None
+            continue
+        if chunk is done:
+            break
+        if deadline is None:
+            deadline = time.monotonic() + max_delay
+        batch.extend(chunk)
+        while len(batch) >= size:
+            yield batch[:size]
+            batch = batch[size:]
+        if not batch:
+            deadline = None
+    if batch:
+        yield batch
+    if errors:
+        raise errors[0]
+
+
+def _decode(lines):
+    """JSON objects of a batch of lines, decoded as one array when they are all valid."""
+    try:
+        # one decode call per batch costs a third of one per line
+        events = json.loads("[" + b",".join(lines).decode("utf-8") + "]")
+    except ValueError:
+        pass
+    else:
+        # a blank line breaks the array, so every line gave at least one value;
+        # a line holding two (e.g. "{...}, {...}") is malformed on its own
+        if len(events) == len(lines):
+            return events
+    events = []
+    for line in lines:
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            if line.strip():
+                events.append(None)
+    return events
+
+
+def parse_events(lines, catalog):
+    """(is watch, email, movie id, rating or None) for each well-formed event in a batch of JSONL lines.
+
+    An event is {"email": ..., "movie_id": 42} or {"email": ..., "title": ...},
+    with an optional "event" ("watch", the default, or "rate") and "rating".
+    Malformed lines and unknown movies are skipped and counted.
+    """
+    n = len(catalog)
+    for event in _decode(lines):
+        try:
+            movie_id = event.get("movie_id")
+            if movie_id is None:
+                movie_id = catalog.find(event["title"])
+                if movie_id is None:
+                    raise KeyError(event["title"])
+            movie_id = int(movie_id)
+            if not 0 <= movie_id < n:
+                raise ValueError(f"no movie {movie_id}")
+            kind = event.get("event", "watch")
+            if kind != "watch" and kind != "rate":
+                raise ValueError(f"unknown event {kind!r}")
+            rating = event.get("rating")
+            yield kind == "watch", str(event["email"]), movie_id, None if rating is None else float(rating)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            metrics.count("ingest_rejected")
+
+
+class WatchStats:
+    """Running aggregates over watch events: popularity, ratings, histories and co-watches.
+
+    Co-watches pair each new watch with the user's `window` previous ones.
+    Pairs are buffered as packed int64 keys and merged into one sorted
+    (key, count) table once the buffer is as large as the table, so every
+    pair is re-sorted O(log events) times in total rather than on each batch.
+    """
+
+    def __init__(self, n_movies, window=10):
+        self.n_movies = n_movies
+        self.window = window
+        self.watches = np.zeros(n_movies, dtype=np.int64)
+        self.rating_sum = np.zeros(n_movies, dtype=np.float64)
+        self.rating_count = np.zeros(n_movies, dtype=np.int64)
+        # email -> (ordered dict of watched ids, the last `window` of them)
+        self.histories = {}
+        self.pair_keys = np.empty(0, dtype=np.int64)  # sorted min * n + max
+        self.pair_counts = np.empty(0, dtype=np.int64)
+        self.pending = []
+        self.pending_size = 0
+
+    def add(self, batch):
+        """Fold a batch of parsed events in; returns the (email, movie id) watches that are new."""
+        new = []
+        firsts, seconds = [], []
+        rated, ratings = [], []
+        window = self.window
+        histories = self.histories
+        for watch, email, movie_id, rating in batch:
+            if rating is not None:
+                rated.append(movie_id)
+                ratings.append(rating)
+            if not watch:
+                continue
+            entry = histories.get(email)
+            if entry is None:
+                entry = histories[email] = ({}, [])
+            history, recent = entry
+            if movie_id in history:
+                continue
+            history[movie_id] = None
+            new.append((email, movie_id))
+            if recent:
+                firsts.extend(recent)
+                seconds.append((movie_id, len(recent)))
+            recent.append(movie_id)
+            if len(recent) > window:
+                del recent[0]
+
+        if new:
+            np.add.at(self.watches, np.fromiter((m for _, m in new), dtype=np.int64, count=len(new)), 1)
+        if rated:
+            rated = np.array(rated, dtype=np.int64)
+            np.add.at(self.rating_sum, rated, np.array(ratings, dtype=np.float64))
+            np.add.at(self.rating_count, rated, 1)
+        if firsts:
+            a = np.array(firsts, dtype=np.int64)
+            movies, counts = np.array(seconds, dtype=np.int64).T
+            b = np.repeat(movies, counts)
+            self.pending.append(np.minimum(a, b) * self.n_movies + np.maximum(a, b))
+            self.pending_size += len(a)
+            if self.pending_size >= max(len(self.pair_keys), 1 << 20):
+                self.compact()
+        return new
+
+    def compact(self):
+        """Merge buffered co-watch pairs into the sorted (key, count) table."""
+        if not self.pending:
+            return
+        keys = np.concatenate([self.pair_keys] + self.pending)
+        counts = np.concatenate([self.pair_counts, np.ones(self.pending_size, dtype=np.int64)])
+        order = np.argsort(keys, kind="stable")
+        keys, counts = keys[order], counts[order]
+        first = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        self.pair_keys = keys[first]
+        self.pair_counts = np.add.reduceat(counts, first) if len(keys) else counts
+        self.pending = []
+        self.pending_size = 0
+
+    def cowatch(self):
+        """Symmetric movies x movies scipy CSR matrix of co-watch counts."""
+        import scipy.sparse as sp
+        self.compact()
+        rows, cols = np.divmod(self.pair_keys, self.n_movies)
+        counts = self.pair_counts.astype(np.float32)
+        shape = (self.n_movies, self.n_movies)
+        return sp.csr_matrix((np.concatenate([counts, counts]),
+                              (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), shape=shape)
+
+    def popular(self, k=10):
+        """Ids of the k most watched movies, most watched first."""
+        k = min(k, self.n_movies)
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-self.watches, k - 1)[:k]
+        return top[np.lexsort((top, -self.watches[top]))]
+
+    def save(self, path):
+        self.compact()
+        np.savez(path, watches=self.watches, rating_sum=self.rating_sum, rating_count=self.rating_count,
+                 pair_keys=self.pair_keys, pair_counts=self.pair_counts)
+
+
+class Ingestor:
+    """Streams watch events from files or sockets into WatchStats and the profile store.
+
+    Sources run on producer threads: lines are grouped into micro batches
+    and each batch is parsed and handed over through a bounded
+    queue. When the consumer falls behind, put() blocks, so a file reader
+    stops reading and a socket connection stops being drained until its
+    sender's TCP window fills up. That is the backpressure. The consumer folds each batch into
+    the aggregates and commits its new watches to the store in one
+    transaction.
+    """
+
+    def __init__(self, catalog, store=None, batch_size=20000, max_delay=0.2, queue_size=4, window=10):
+        self.catalog = catalog
+        self.store = store  # a ProfileStore; None keeps the aggregates in memory only
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue = queue.Queue(queue_size)
+        self.stats = WatchStats(len(catalog), window)
+        # compiled catalogs decode titles on access, and popular movies recur constantly
+        self.titles = {}
+        self.events = 0
+        self.batches = 0
+        self.blocked = 0.0  # seconds producers spent waiting on a full queue
+        self.lock = threading.Lock()
+
+    def produce(self, stream):
+        """Parse and batch a binary JSONL stream into the queue; blocks while the queue is full."""
+        for chunk in micro_batches(read_lines(stream), self.batch_size, self.max_delay):
+            batch = list(parse_events(chunk, self.catalog))
+            if self.queue.full():
+                started = time.perf_counter()
+                self.queue.put(batch)
+                with self.lock:
+                    self.blocked += time.perf_counter() - started
+            else:
+                self.queue.put(batch)
+
+    def consume(self):
+        """Commit batches until a None arrives."""
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            self.commit(batch)
+
+    def commit(self, batch):
+        with metrics.span("ingest_commit"):
+            new = self.stats.add(batch)
+            if self.store is not None and new:
+                # grouped by user the inserts touch far fewer index pages; the
+                # sort is stable, so each user's watches keep their order
+                rows = sorted(((email, self.title(m)) for email, m in new), key=itemgetter(0))
+                # stored bitsets of these users are now stale
+                self.store.write_batch(watched=rows, stale_bits={email for email, _ in new})
+        self.events += len(batch)
+        self.batches += 1
+        metrics.count("ingest_events", len(batch))
+
+    def read_files(self, paths):
+        """Produce from JSONL files in turn; "-" is stdin."""
+        for path in paths:
+            if path == "-":
+                self.produce(sys.stdin.buffer)
+            else:
+                with open(path, "rb") as f:
+                    self.produce(f)
+
+    def title(self, movie_id):
+        title = self.titles.get(movie_id)
+        if title is None:
+            title = self.titles[movie_id] = self.catalog.titles[movie_id]
+        return title
+
+    def ingest_files(self, paths):
+        """Ingest JSONL files to the end; returns the number of events committed."""
+        def read():
+            try:
+                self.read_files(paths)
+            finally:
+                self.stop()
+
+        producer = threading.Thread(target=read, name="ingest-reader", daemon=True)
+        producer.start()
+        self.consume()
+        producer.join()
+        return self.events
+
+    def listen(self, port, host="127.0.0.1"):
+        """Accept JSONL event streams on a local TCP port, one producer thread per connection.
+
+        Call consume() to start committing; stop() ends it.
+        """
+        ingestor = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                ingestor.produce(self.rfile)
+
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="ingest-listener", daemon=True).start()
+        return server
+
+    def stop(self):
+        self.queue.put(None)
+
+    def summary(self):
+        self.stats.compact()
+        return {
+            "events": self.events,
+            "batches": self.batches,
+            "users": len(self.stats.histories),
+            "cowatch_pairs": len(self.stats.pair_keys),
+            "blocked_seconds": round(self.blocked, 3),
+        }
+
+
+if __name__ == "__main__":
+    from catalog import load_catalog
+    from profile_store import ProfileStore
+
+    parser = argparse.ArgumentParser(description="Ingest a stream of watch/rating events")
+    parser.add_argument("events", nargs="*", help="JSONL event files, - for stdin")
+    parser.add_argument("--catalog", help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--db", default="cinemate.db", help="profile store the watches are committed to")
+    parser.add_argument("--listen", type=int, metavar="PORT",
+                        help="also accept JSONL streams on 127.0.0.1:PORT until interrupted")
+    parser.add_argument("--out", help="save popularity, rating and co-watch aggregates here (.npz)")
+    parser.add_argument("--batch-size", type=int, default=20000, help="most events committed per transaction")
+    parser.add_argument("--queue-size", type=int, default=4, help="batches buffered before producers block")
+    parser.add_argument("--window", type=int, default=10, help="previous watches each watch is paired with")
+    args = parser.parse_args()
+
+    store = ProfileStore(args.db)
+    ingestor = Ingestor(load_catalog(args.catalog), store, args.batch_size, queue_size=args.queue_size,
+                        window=args.window)
+    # committing on its own thread means an interrupt never lands mid-transaction
+    consumer = threading.Thread(target=ingestor.consume, name="ingest-consumer")
+    consumer.start()
+    server = None
+    started = time.perf_counter()
+    try:
+        if args.listen:
+            server = ingestor.listen(args.listen)
+            print(f"Listening for events on 127.0.0.1:{args.listen}", file=sys.stderr)
+            threading.Thread(target=ingestor.read_files, args=(args.events,), daemon=True).start()
+            consumer.join()
+        else:
+            ingestor.read_files(args.events)
+    except KeyboardInterrupt:
+        pass
+    if server is not None:
+        server.shutdown()
+        # connections still open flush their partial batches on the max_delay timer
+        time.sleep(ingestor.max_delay * 2)
+    # batches already queued, e.g. from sockets, are committed before the store closes
+    ingestor.stop()
+    consumer.join()
+    elapsed = time.perf_counter() - started
+    if args.out:
+        ingestor.stats.save(args.out)
+    store.close()
+    summary = ingestor.summary()
+    summary["events_per_second"] = round(summary["events"] / elapsed, 1) if elapsed else None
+    print(json.dumps(summary))
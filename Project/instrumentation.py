@@ -0,0 +1,200 @@
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+
+# A span can only be profiled while no other one is: one cProfile at a time
+_PROFILE_LOCK = threading.Lock()
+_NO_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "started", "profiler")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        if self.metrics.profile_spans and _PROFILE_LOCK.acquire(blocking=False):
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+            _PROFILE_LOCK.release()
+            self.metrics.add_profile(self.profiler)
+        self.metrics.observe(self.name, elapsed)
+        return False
+
+
+class Metrics:
+    """Timing spans and counters for the recommendation pipeline.
+
+    While disabled, span() hands back a shared no-op context manager and
+    count() returns immediately, so instrumented code costs one attribute
+    check. Enable with CINEMATE_METRICS=1 (or CINEMATE_PROFILE, see
+    start_profiling).
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.profile_spans = False
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.spans = {}  # name -> [calls, total seconds, max seconds]
+        self.profile = None  # pstats.Stats merged from profiled spans
+
+    def span(self, name):
+        """Context manager timing one pipeline stage."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        """Record a duration measured elsewhere, e.g. across threads."""
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def add_profile(self, profiler):
+        import pstats
+        with self.lock:
+            if self.profile is None:
+                self.profile = pstats.Stats(profiler)
+            else:
+                self.profile.add(profiler)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.spans.clear()
+            self.profile = None
+
+    def snapshot(self, gauges=None):
+        """Plain-dict view of every counter and span; gauges are extra {group: {name: value}}."""
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "counters": dict(self.counters),
+                "spans": {
+                    name: {"count": calls, "total_seconds": total, "max_seconds": longest}
+                    for name, (calls, total, longest) in self.spans.items()
+                },
+                "gauges": gauges or {},
+            }
+
+    def prometheus(self, gauges=None):
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot(gauges)
+        lines = ["# TYPE cinemate_span_seconds summary"]
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(f'cinemate_span_seconds_count{{span="{name}"}} {stats["count"]}')
+            lines.append(f'cinemate_span_seconds_sum{{span="{name}"}} {stats["total_seconds"]:.6f}')
+        lines.append("# TYPE cinemate_span_seconds_max gauge")
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(f'cinemate_span_seconds_max{{span="{name}"}} {stats["max_seconds"]:.6f}')
+        lines.append("# TYPE cinemate_events_total counter")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f'cinemate_events_total{{event="{name}"}} {value}')
+        for group, values in sorted(snapshot["gauges"].items()):
+            for name, value in sorted(values.items()):
+                lines.append(f"# TYPE cinemate_{group}_{name} gauge")
+                lines.append(f"cinemate_{group}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, fmt="prometheus", gauges=None):
+        """(content type, body bytes) for a /metrics response in fmt "prometheus" or "json"."""
+        if fmt == "json":
+            return "application/json", json.dumps(self.snapshot(gauges)).encode("utf-8")
+        return "text/plain; version=0.0.4", self.prometheus(gauges).encode("utf-8")
+
+    def start_profiling(self, mode=None, path=None):
+        """Start a capture chosen by CINEMATE_PROFILE; results are written at exit.
+
+        "cprofile" profiles the code inside spans on every thread and dumps
+        pstats to CINEMATE_PROFILE_OUT (default cinemate.prof). "tracemalloc"
+        traces allocations from now on and writes the top allocation sites
+        (default cinemate-alloc.txt).
+        """
+        mode = mode or os.environ.get("CINEMATE_PROFILE")
+        if not mode:
+            return
+        path = path or os.environ.get("CINEMATE_PROFILE_OUT")
+        self.enabled = True
+        if mode == "cprofile":
+            self.profile_spans = True
+            atexit.register(self.write_profile, path or "cinemate.prof")
+        elif mode == "tracemalloc":
+            import tracemalloc
+            tracemalloc.start(25)
+            atexit.register(self.write_allocations, path or "cinemate-alloc.txt")
+        else:
+            raise ValueError(f"Unknown profiling mode {mode!r}, expected cprofile or tracemalloc")
+
+    def write_profile(self, path):
+        with self.lock:
+            if self.profile is not None:
+                self.profile.dump_stats(path)
+
+    def write_allocations(self, path, limit=50):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"current {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB\n")
+            for stat in snapshot.statistics("lineno")[:limit]:
+                f.write(f"{stat}\n")
+
+    def serve(self, port, host="127.0.0.1", gauges=None):
+        """Expose GET /metrics (Prometheus text) and /metrics.json from a daemon thread.
+
+        gauges is an optional callable returning extra gauge groups at scrape time.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/metrics", "/metrics.json"):
+                    self.send_error(404)
+                    return
+                fmt = "json" if self.path.endswith(".json") else "prometheus"
+                content_type, body = metrics.export(fmt, gauges() if gauges else None)
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+
+# Process-wide registry used by the engine, the GUI and the server
+metrics = Metrics(enabled=os.environ.get("CINEMATE_METRICS", "") not in ("", "0"))
+metrics.start_profiling()
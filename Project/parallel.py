@@ -0,0 +1,94 @@
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch import chunked, default_chunk_size, user_seeds
+from scoring import MovieCatalog, ScoringEngine
+
+# Catalog columns the scorer needs; titles stay in the parent process
+SHARED_COLUMNS = ["genre_matrix", "rating", "year", "duration"]
+
+# Per-worker state, set up once by _init_worker
+_worker_engine = None
+_worker_shm = None
+
+
+class SharedCatalog:
+    """Copies the catalog's numeric columns into one shared memory block."""
+
+    def __init__(self, catalog):
+        arrays = [np.ascontiguousarray(getattr(catalog, name)) for name in SHARED_COLUMNS]
+        layout = []
+        offset = 0
+        for name, array in zip(SHARED_COLUMNS, arrays):
+            offset += -offset % 8
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += array.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (name, dtype, shape, start), array in zip(layout, arrays):
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)[...] = array
+        # everything a worker needs to rebuild the catalog, small enough to pickle
+        self.spec = (self.shm.name, layout, catalog.genre_names)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_catalog(spec):
+    name, layout, genre_names = spec
+    shm = shared_memory.SharedMemory(name=name)
+    columns = {
+        field: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        for field, dtype, shape, start in layout
+    }
+    catalog = MovieCatalog(titles=(), genre_names=genre_names, **columns)
+    return shm, catalog
+
+
+def _init_worker(spec):
+    global _worker_engine, _worker_shm
+    _worker_shm, catalog = attach_catalog(spec)
+    _worker_engine = ScoringEngine(catalog)
+
+
+def _score_chunk(args):
+    users, watched, seeds, k = args
+    return _worker_engine.top_k_batch(users, k, watched, seeds)
+
+
+def recommend_batch_parallel(recommender, profiles, k=5, chunk_size=None, workers=None, seed=None):
+    """Like batch.recommend_batch, but chunks of users are scored in a process pool."""
+    catalog = recommender.catalog
+    chunk_size = chunk_size or default_chunk_size(catalog)
+    workers = workers or mp.cpu_count()
+
+    with SharedCatalog(catalog) as shared:
+        with mp.Pool(workers, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+            # a bounded window of in-flight chunks keeps memory flat, and
+            # draining it front first merges worker results back in input order
+            in_flight = deque()
+            offset = 0
+            for chunk in chunked(profiles, chunk_size):
+                # workers have no title table, so watched titles are resolved here
+                watched = [recommender.scorer.watched_ids(p["watched_movies"]) for p in chunk]
+                seeds = user_seeds(seed, offset, len(chunk))
+                offset += len(chunk)
+                in_flight.append((chunk, pool.apply_async(_score_chunk, ((chunk, watched, seeds, k),))))
+                if len(in_flight) >= 2 * workers:
+                    yield from _collect(*in_flight.popleft())
+            while in_flight:
+                yield from _collect(*in_flight.popleft())
+
+
+def _collect(chunk, result):
+    yield from zip(chunk, result.get())
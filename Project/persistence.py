@@ -0,0 +1,138 @@
+import threading
+
+
+class WriteBehindStore:
+    """Buffers profile writes and flushes them to a ProfileStore from a background thread.
+
+    Rapid changes to the same profile are coalesced so only the latest copy is
+    written, and each flush is one SQLite transaction, so a crash mid-write
+    leaves the previous state intact. Reads and logout/shutdown flush first.
+    A failed write stays pending and is retried with a backoff; the
+    synchronous flushes raise the error if it persists.
+    """
+
+    def __init__(self, store, delay=0.5):
+        self.store = store
+        self.delay = delay
+        self.io_lock = threading.Lock()  # serializes every call into the store
+        self.cond = threading.Condition()  # guards the pending state below
+        self.profiles = {}
+        self.watched = []
+        self.watched_bits = {}
+        self.current = None
+        self.current_dirty = False
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="profile-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, profile):
+        snapshot = dict(profile, genres=list(profile["genres"]), watched_movies=list(profile["watched_movies"]))
+        with self.cond:
+            self.profiles[profile["email"]] = snapshot
+            self.cond.notify()
+
+    def add_watched(self, email, title):
+        with self.cond:
+            self.watched.append((email, title))
+            self.cond.notify()
+
+    def save_watched_bits(self, email, catalog_version, bits):
+        with self.cond:
+            self.watched_bits[email] = (email, catalog_version, bits)
+            self.cond.notify()
+
+    def set_current(self, email):
+        with self.cond:
+            self.current = email
+            self.current_dirty = True
+            self.cond.notify()
+
+    def _dirty(self):
+        return bool(self.profiles or self.watched or self.watched_bits or self.current_dirty)
+
+    def _take(self):
+        with self.cond:
+            batch = (list(self.profiles.values()), self.watched, self.current, self.current_dirty,
+                     list(self.watched_bits.values()))
+            self.profiles = {}
+            self.watched = []
+            self.watched_bits = {}
+            self.current_dirty = False
+            return batch
+
+    def _restore(self, batch):
+        # a failed batch goes back under anything queued since, which is newer
+        profiles, watched, current, current_dirty, watched_bits = batch
+        with self.cond:
+            for profile in profiles:
+                self.profiles.setdefault(profile["email"], profile)
+            self.watched = watched + self.watched
+            for row in watched_bits:
+                self.watched_bits.setdefault(row[0], row)
+            if current_dirty and not self.current_dirty:
+                self.current = current
+                self.current_dirty = True
+
+    def flush(self):
+        """Write everything pending now; if the write fails it stays pending and the error is raised."""
+        with self.io_lock:
+            batch = self._take()
+            profiles, watched, current, current_dirty, watched_bits = batch
+            if not (profiles or watched or current_dirty or watched_bits):
+                return
+            try:
+                self.store.write_batch(profiles, watched, current, set_current=current_dirty,
+                                       watched_bits=watched_bits)
+            except Exception:
+                self._restore(batch)
+                raise
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self.cond:
+                while not self._dirty() and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                # give further changes a moment to pile up before writing;
+                # after a failure (e.g. another process holding the database
+                # lock) back off before retrying
+                self.cond.wait(min(self.delay * 2 ** failures, 30))
+            try:
+                self.flush()
+                failures = 0
+            except Exception:
+                failures += 1
+
+    def get(self, email):
+        self.flush()
+        with self.io_lock:
+            return self.store.get(email)
+
+    def current_email(self):
+        self.flush()
+        with self.io_lock:
+            return self.store.current_email()
+
+    def load_watched_bits(self, email, catalog_version):
+        self.flush()
+        with self.io_lock:
+            return self.store.load_watched_bits(email, catalog_version)
+
+    def import_json(self, path):
+        self.flush()
+        with self.io_lock:
+            return self.store.import_json(path)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        try:
+            # raises if what the writer thread could not write still fails
+            self.flush()
+        finally:
+            with self.io_lock:
+                self.store.close()
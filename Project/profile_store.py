@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+
+USER_FIELDS = ["email", "name", "age", "genres", "bio", "password", "registration_date", "preferred_theme"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT,
+    age INTEGER,
+    genres TEXT,
+    bio TEXT,
+    password TEXT,
+    registration_date TEXT,
+    preferred_theme TEXT
+);
+CREATE TABLE IF NOT EXISTS watched (
+    email TEXT NOT NULL,
+    title TEXT NOT NULL,
+    PRIMARY KEY (email, title)
+);
+CREATE TABLE IF NOT EXISTS watched_bits (
+    email TEXT PRIMARY KEY,
+    catalog_version TEXT NOT NULL,
+    bits BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ProfileStore:
+    """Multi-user profile store in SQLite (WAL mode), keyed by email."""
+
+    def __init__(self, path="cinemate.db"):
+        self.path = path
+        # the write-behind layer flushes from its own thread and serializes access
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get(self, email):
+        row = self.db.execute(
+            f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE email = ?", (email,)
+        ).fetchone()
+        if row is None:
+            return None
+        profile = dict(zip(USER_FIELDS, row))
+        profile["genres"] = json.loads(profile["genres"])
+        profile["watched_movies"] = self.watched(email)
+        return profile
+
+    def watched(self, email):
+        rows = self.db.execute("SELECT title FROM watched WHERE email = ? ORDER BY rowid", (email,))
+        return [title for (title,) in rows]
+
+    def iter_watched(self):
+        """Every (email, title) pair in the store, grouped by user."""
+        return self.db.execute("SELECT email, title FROM watched ORDER BY email, rowid")
+
+    def put(self, profile):
+        """Insert or update a profile; watched titles are only ever added, never rewritten."""
+        with self.db:
+            self._put(profile)
+
+    def add_watched(self, email, title):
+        with self.db:
+            self._add_watched([(email, title)])
+
+    def load_watched_bits(self, email, catalog_version):
+        """Stored watched bitset for this catalog version, or None if missing or stale."""
+        row = self.db.execute(
+            "SELECT bits FROM watched_bits WHERE email = ? AND catalog_version = ?", (email, catalog_version)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_watched_bits(self, email, catalog_version, bits):
+        with self.db:
+            self._save_watched_bits([(email, catalog_version, bits)])
+
+    def write_batch(self, profiles=(), watched=(), current=None, set_current=False, watched_bits=(),
+                    stale_bits=()):
+        """Apply many updates in one transaction, i.e. one commit/fsync for the lot.
+
+        stale_bits lists emails whose stored watched bitset no longer matches
+        their titles (e.g. after ingesting watches); it is dropped and rebuilt
+        from the titles on next use.
+        """
+        with self.db:
+            for profile in profiles:
+                self._put(profile)
+            self._add_watched(watched)
+            self._save_watched_bits(watched_bits)
+            self.db.executemany("DELETE FROM watched_bits WHERE email = ?", [(email,) for email in stale_bits])
+            if set_current:
+                self._set_current(current)
+
+    def _put(self, profile):
+        values = [profile.get(f) for f in USER_FIELDS]
+        values[USER_FIELDS.index("genres")] = json.dumps(profile.get("genres", []))
+        self.db.execute(
+            f"INSERT OR REPLACE INTO users ({', '.join(USER_FIELDS)}) "
+            f"VALUES ({', '.join('?' * len(USER_FIELDS))})",
+            values,
+        )
+        self._add_watched([(profile["email"], t) for t in profile.get("watched_movies", [])])
+
+    def _add_watched(self, pairs):
+        self.db.executemany("INSERT OR IGNORE INTO watched (email, title) VALUES (?, ?)", pairs)
+
+    def _save_watched_bits(self, rows):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO watched_bits (email, catalog_version, bits) VALUES (?, ?, ?)", rows
+        )
+
+    def delete(self, email):
+        with self.db:
+            self.db.execute("DELETE FROM users WHERE email = ?", (email,))
+            self.db.execute("DELETE FROM watched WHERE email = ?", (email,))
+            self.db.execute("DELETE FROM watched_bits WHERE email = ?", (email,))
+
+    def emails(self):
+        return [email for (email,) in self.db.execute("SELECT email FROM users ORDER BY email")]
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def current_email(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'current_user'").fetchone()
+        return row[0] if row else None
+
+    def set_current(self, email):
+        with self.db:
+            self._set_current(email)
+
+    def _set_current(self, email):
+        if email is None:
+            self.db.execute("DELETE FROM meta WHERE key = 'current_user'")
+        else:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('current_user', ?)", (email,))
+
+    def import_json(self, path):
+        """Move a legacy single-user cinemate_user.json into the store."""
+        try:
+            with open(path, "r") as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.put(profile)
+        self.set_current(profile["email"])
+        os.remove(path)
+        return profile["email"]
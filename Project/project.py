@@ -1,12 +1,29 @@
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import random
 import os
+import queue
+import sys
+import threading
+import time
+
+from instrumentation import metrics
+from persistence import WriteBehindStore
+from profile_store import ProfileStore
+from widgets import VirtualGrid
 
 class CineMate:
-    def __init__(self, root):
+    recommendation_count = 5
+    search_result_count = 20
+    search_delay_ms = 150
+
+    def __init__(self, root, catalog_path=None, neighbors_path=None, ann_path=None, model_path=None, timing=False,
+                 session_budget=256 * 2**20):
+        self.started = time.perf_counter()
+        self.timing = timing
+        self.stages = {}
         self.root = root
         self.root.title("CineMate - AI Movie Recommendations")
         self.root.geometry("1000x750")
@@ -30,26 +47,123 @@ class CineMate:
         self.current_theme = "Cinematic"
         self.apply_theme()
 
-        self.movie_db = [
-            {"title": "Inception", "genres": ["Sci-Fi", "Action"], "rating": 8.8, "year": 2010, "duration": 148},
-            {"title": "The Shawshank Redemption", "genres": ["Drama"], "rating": 9.3, "year": 1994, "duration": 142},
-            {"title": "Pulp Fiction", "genres": ["Crime", "Drama"], "rating": 8.9, "year": 1994, "duration": 154},
-            {"title": "The Dark Knight", "genres": ["Action", "Crime", "Drama"], "rating": 9.0, "year": 2008, "duration": 152},
-            {"title": "Fight Club", "genres": ["Drama"], "rating": 8.8, "year": 1999, "duration": 139},
-            {"title": "Forrest Gump", "genres": ["Drama", "Romance"], "rating": 8.8, "year": 1994, "duration": 142},
-            {"title": "The Matrix", "genres": ["Action", "Sci-Fi"], "rating": 8.7, "year": 1999, "duration": 136},
-            {"title": "Goodfellas", "genres": ["Crime", "Drama"], "rating": 8.7, "year": 1990, "duration": 146},
-            {"title": "The Silence of the Lambs", "genres": ["Crime", "Thriller"], "rating": 8.6, "year": 1991, "duration": 118},
-            {"title": "Interstellar", "genres": ["Adventure", "Drama", "Sci-Fi"], "rating": 8.6, "year": 2014, "duration": 169},
-        ]
-
+        # The window paints before anything slow runs: the profile store and
+        # the catalog (which pulls in NumPy and any model) load on worker
+        # threads, and poll_startup swaps in the real interface as they land
+        self.store = None
         self.current_user = None
-        self.load_user_data()
-
-        if self.current_user:
-            self.create_main_interface()
-        else:
-            self.create_login_interface()
+        self.recommender = None
+        self.catalog = None
+        self.notebook = None
+        startup = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+        self.store_loading = startup.submit(self.open_store)
+        self.catalog_loading = startup.submit(self.load_catalog, catalog_path, neighbors_path, ann_path, model_path)
+        startup.shutdown(wait=False)
+
+        # The title search index takes seconds on huge catalogs, so it is
+        # built in the background once the catalog is in; searches wait for search_ready
+        self.search_ready = threading.Event()
+
+        # Scoring runs on a worker thread; results come back through a queue
+        # polled from the mainloop, tagged with the request that produced them
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommender")
+        self.results = queue.Queue()
+        self.request_id = 0
+        self.pending = None
+        self.polling = False
+
+        # users switching on a shared machine keep their sessions (watched
+        # set, live ranking) in memory until the budget pushes them out
+        self.session_budget = session_budget
+        self.sessions = None
+        self.session = None
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.create_splash()
+        self.root.update_idletasks()
+        self.mark("window")
+        self.root.after(20, self.poll_startup)
+
+    def mark(self, stage):
+        """Record how long after startup a stage first completed; printed with --timing."""
+        if stage in self.stages:
+            return
+        elapsed = time.perf_counter() - self.started
+        self.stages[stage] = elapsed
+        metrics.observe(f"startup_{stage}", elapsed)
+        if self.timing:
+            print(f"startup: {stage} after {elapsed * 1000:.0f} ms", file=sys.stderr)
+
+    def open_store(self):
+        # profile writes are buffered and flushed off the UI thread
+        store = WriteBehindStore(ProfileStore("cinemate.db"))
+        # profiles saved by older versions are migrated into the store once
+        if os.path.exists('cinemate_user.json'):
+            store.import_json('cinemate_user.json')
+        email = store.current_email()
+        return store, store.get(email) if email else None
+
+    def load_catalog(self, catalog_path, neighbors_path, ann_path, model_path):
+        from recommender import Recommender
+        return Recommender.from_path(catalog_path, neighbors_path, ann_path, model_path)
+
+    def poll_startup(self):
+        if self.store is None and self.store_loading.done():
+            try:
+                self.store, self.current_user = self.store_loading.result()
+            except Exception as e:
+                self.startup_failed("your profiles", e)
+                return
+            self.mark("profiles")
+            if self.current_user:
+                self.create_main_interface()
+            else:
+                self.create_login_interface()
+            self.mark("interface")
+
+        if self.recommender is None and self.catalog_loading.done():
+            try:
+                self.recommender = self.catalog_loading.result()
+            except Exception as e:
+                self.startup_failed("the movie catalog", e)
+                return
+            self.catalog = self.recommender.catalog
+            self.mark("catalog")
+            threading.Thread(target=self.build_title_index, name="title-index", daemon=True).start()
+            if self.notebook is not None:
+                self.open_session()
+                self.build_selected_tab()  # a tab opened while loading is waiting for the catalog
+
+        if self.store is None or self.recommender is None:
+            self.root.after(20, self.poll_startup)
+
+    def gauges(self):
+        # cache and session sizes for /metrics, once the catalog is in
+        if self.recommender is None:
+            return {}
+        gauges = {"cache": self.recommender.cache.stats()}
+        if self.sessions is not None:
+            gauges["sessions"] = self.sessions.stats()
+        return gauges
+
+    def startup_failed(self, what, error):
+        messagebox.showerror("Error", f"Could not load {what}: {error}")
+        self.on_close()
+
+    def build_title_index(self):
+        self.catalog.title_index()
+        self.search_ready.set()
+        self.mark("title_index")
+
+    def create_splash(self):
+        theme = self.themes[self.current_theme]
+        frame = ttk.Frame(self.root, padding=30)
+        frame.pack(expand=True)
+        ttk.Label(frame, text="CineMate", font=theme["font_title"], foreground=theme["accent"]).pack(pady=20)
+        ttk.Label(frame, text="Loading...", font=theme["font_subtitle"]).pack(pady=10)
+        progress = ttk.Progressbar(frame, mode="indeterminate", length=300)
+        progress.pack(pady=10)
+        progress.start(15)
 
     def apply_theme(self):
         theme = self.themes[self.current_theme]
@@ -65,16 +179,9 @@ class CineMate:
         self.style.configure('Accent.TButton', background=theme["accent"], foreground=theme["fg"], padding=10)
         self.style.map('TButton', background=[('active', theme["accent"])])
 
-    def load_user_data(self):
-        try:
-            with open('cinemate_user.json', 'r') as f:
-                self.current_user = json.load(f)
-        except:
-            self.current_user = None
-
     def save_user_data(self):
-        with open('cinemate_user.json', 'w') as f:
-            json.dump(self.current_user, f)
+        self.store.put(self.current_user)
+        self.store.set_current(self.current_user["email"])
 
     def clear_window(self):
         for widget in self.root.winfo_children():
@@ -82,6 +189,7 @@ class CineMate:
 
     def create_login_interface(self):
         self.clear_window()
+        self.notebook = None
         theme = self.themes[self.current_theme]
 
         frame = ttk.Frame(self.root, padding=30)
@@ -108,7 +216,10 @@ class CineMate:
             entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
             self.entries[key] = entry
 
-        ttk.Button(frame, text="Register", command=self.register_user, style='Accent.TButton').pack(pady=20)
+        buttons = ttk.Frame(frame)
+        buttons.pack(pady=20)
+        ttk.Button(buttons, text="Register", command=self.register_user, style='Accent.TButton').pack(side=tk.LEFT, padx=10)
+        ttk.Button(buttons, text="Login", command=self.login_user).pack(side=tk.LEFT, padx=10)
 
     def register_user(self):
         try:
@@ -128,6 +239,8 @@ class CineMate:
                 raise ValueError("Invalid name or email.")
             if data["age"] < 13 or len(data["password"]) < 6:
                 raise ValueError("Age must be >=13 and password >=6 characters.")
+            if self.store.get(data["email"]) is not None:
+                raise ValueError("An account with this email already exists. Use Login instead.")
 
             self.current_user = data
             self.save_user_data()
@@ -135,28 +248,83 @@ class CineMate:
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def login_user(self):
+        user = self.store.get(self.entries["email"].get())
+        if user is None or user["password"] != self.entries["password"].get():
+            messagebox.showerror("Error", "Unknown email or wrong password.")
+            return
+        self.current_user = user
+        self.store.set_current(user["email"])
+        self.create_main_interface()
+
+    def open_session(self):
+        from sessions import SessionManager
+        if self.sessions is None:
+            self.sessions = SessionManager(self.recommender, self.store, self.session_budget)
+        # a user logging back in gets their in-memory session if it is still there
+        self.session = self.sessions.open(self.current_user["email"], self.current_user)
+        self.current_user = self.session.profile
+        self.watched = self.session.watched
+
+    def mark_watched(self, movie_id):
+        if not self.sessions.mark_watched(self.session, movie_id):
+            return
+        # tabs that have not been opened yet pick the change up when they are built
+        if self.watched_list_frame is not None:
+            self.refresh_watched_list()
+            if self.search_results.items:
+                self.search_results.set_items(self.search_results.items)  # updates the Watched buttons
+        if self.recommendations_grid is not None:
+            self.generate_recommendations()
+
     def create_main_interface(self):
         self.clear_window()
         theme = self.themes[self.current_theme]
+        if self.catalog is not None:
+            self.open_session()
+        self.recommendations_grid = None
+        self.watched_list_frame = None
+        self.search_job = None
 
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(expand=True, fill=tk.BOTH)
 
+        # (name, builder, needs the catalog)
         tabs = [
-            ("Profile", self.create_profile_tab),
-            ("Recommendations", self.create_recommendations_tab),
-            ("Watched Movies", self.create_watched_tab)
+            ("Profile", self.create_profile_tab, False),
+            ("Recommendations", self.create_recommendations_tab, True),
+            ("Watched Movies", self.create_watched_tab, True)
         ]
 
-        for name, func in tabs:
+        # tabs are only built the first time they are selected
+        self.unbuilt_tabs = {}
+        for name, func, needs_catalog in tabs:
             tab = ttk.Frame(self.notebook)
             self.notebook.add(tab, text=name)
-            func(tab)
+            self.unbuilt_tabs[str(tab)] = (func, needs_catalog)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.build_selected_tab())
+        self.build_selected_tab()
 
         bottom = ttk.Frame(self.root)
         bottom.pack(fill=tk.X, pady=15)
         ttk.Button(bottom, text="Logout", command=self.logout, style='Accent.TButton').pack(side=tk.RIGHT, padx=20)
 
+    def build_selected_tab(self):
+        name = self.notebook.select()
+        if name not in self.unbuilt_tabs:
+            return
+        func, needs_catalog = self.unbuilt_tabs[name]
+        tab = self.notebook.nametowidget(name)
+        if needs_catalog and self.catalog is None:
+            if not tab.winfo_children():
+                theme = self.themes[self.current_theme]
+                ttk.Label(tab, text="Loading movie catalog...", font=theme["font_subtitle"]).pack(pady=30)
+            return
+        del self.unbuilt_tabs[name]
+        for widget in tab.winfo_children():
+            widget.destroy()
+        func(tab)
+
     def create_profile_tab(self, parent):
         user = self.current_user
         theme = self.themes[self.current_theme]
@@ -184,88 +352,278 @@ class CineMate:
             ttk.Label(genre_frame, text=g, background=theme["accent"], foreground="white", padding=5).pack(side=tk.LEFT, padx=5)
 
     def create_recommendations_tab(self, parent):
-        theme = self.themes[self.current_theme]
-
-        self.loading_label = ttk.Label(parent, text="Generating recommendations...", font=theme["font_subtitle"])
-        self.loading_label.pack(pady=30)
-
-        self.recommendations_frame = ttk.Frame(parent)
-        self.recommendations_frame.pack(expand=True, fill=tk.BOTH, padx=30, pady=20)
-
-        self.root.after(1500, self.generate_recommendations)
+        with metrics.span("create_recommendations_tab"):
+            theme = self.themes[self.current_theme]
+
+            self.loading_frame = ttk.Frame(parent)
+            self.loading_frame.pack(pady=30)
+            self.loading_label = ttk.Label(self.loading_frame, text="Generating recommendations...", font=theme["font_subtitle"])
+            self.loading_label.pack()
+            self.progress = ttk.Progressbar(self.loading_frame, mode="indeterminate", length=300)
+            self.progress.pack(pady=10)
+
+            self.recommendations_frame = ttk.Frame(parent)
+            self.recommendations_frame.pack(expand=True, fill=tk.BOTH, padx=30, pady=20)
+
+            from facets import Filters
+            # Blank fields leave that side of the range open
+            self.filters = Filters()
+            self.filter_vars = {}
+            filter_frame = ttk.Frame(self.recommendations_frame)
+            filter_frame.pack(fill=tk.X, pady=(0, 10))
+            for label, key in [("From year", "min_year"), ("Max minutes", "max_duration"), ("Min rating", "min_rating")]:
+                ttk.Label(filter_frame, text=label, font=theme["font_body"]).pack(side=tk.LEFT, padx=(10, 5))
+                self.filter_vars[key] = tk.StringVar()
+                ttk.Entry(filter_frame, textvariable=self.filter_vars[key], width=8, foreground="black").pack(side=tk.LEFT)
+            ttk.Button(filter_frame, text="Apply Filters", command=self.apply_filters).pack(side=tk.LEFT, padx=10)
+
+            # Only the visible cards exist as widgets; scrolling refills them in place
+            self.recommendations_grid = VirtualGrid(
+                self.recommendations_frame, cell_width=240, cell_height=340,
+                make_cell=self.make_movie_card, fill_cell=self.fill_movie_card,
+            )
+            self.recommendations_grid.pack(expand=True, fill=tk.BOTH)
+            ttk.Button(self.recommendations_frame, text="Refresh", command=self.refresh_recommendations, style='Accent.TButton').pack(pady=20)
+
+            self.generate_recommendations()
 
     def generate_recommendations(self):
-        user = self.current_user
-        scored = []
-        for m in self.movie_db:
-            score = sum(30 for g in m["genres"] if g in user["genres"])
-            score += m["rating"] * 2
-            if user["age"] < 18 and m["rating"] > 8.5:
-                score -= 10
-            score += random.randint(0, 20)
-            m["match_score"] = min(100, max(0, score))
-            scored.append(m)
-
-        self.recommendations = sorted(scored, key=lambda x: x["match_score"], reverse=True)[:5]
+        # A newer request supersedes any that is still queued or running
+        self.request_id += 1
+        if self.pending is not None:
+            self.pending.cancel()
+        self.pending = self.executor.submit(self.compute_recommendations, self.request_id, self.session, self.filters)
+        self.requested_at = time.perf_counter()
+
+        self.loading_frame.pack(pady=30, before=self.recommendations_frame)
+        self.progress.start(15)
+        if not self.polling:
+            self.polling = True
+            self.root.after(50, self.poll_recommendations)
+
+    def compute_recommendations(self, request_id, session, filters):
+        try:
+            # the session's ranking is patched, not rebuilt, after mark_watched
+            recommendations = self.sessions.recommend(session, self.recommendation_count, filters=filters)
+            self.results.put((request_id, recommendations, None))
+        except Exception as e:
+            self.results.put((request_id, None, e))
+
+    def poll_recommendations(self):
+        latest = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] == self.request_id:
+                latest = result  # results of superseded requests are dropped
+
+        if latest is None:
+            if self.pending is not None:
+                self.root.after(50, self.poll_recommendations)
+            else:
+                self.polling = False
+            return
+
+        self.polling = False
+        self.pending = None
+        self.progress.stop()
+        _, recommendations, error = latest
+        if error is not None:
+            self.loading_frame.pack_forget()
+            messagebox.showerror("Error", f"Could not generate recommendations: {error}")
+            return
+        metrics.observe("recommendations_wait", time.perf_counter() - self.requested_at)
+        self.recommendations = recommendations
         self.display_recommendations()
+        self.mark("recommendations")
 
-    def display_recommendations(self):
+    def make_movie_card(self, parent):
         theme = self.themes[self.current_theme]
-        self.loading_label.pack_forget()
-
-        for widget in self.recommendations_frame.winfo_children():
-            widget.destroy()
-
-        for movie in self.recommendations:
-            card = ttk.Frame(self.recommendations_frame, padding=20, style="TFrame")
-            card.pack(side=tk.LEFT, padx=20, pady=20)
-
-            movie_card = tk.Frame(card, bg=theme["secondary"], relief="flat", width=200, height=300)
-            movie_card.pack_propagate(False)  # Prevent the card from resizing
-
-            title = ttk.Label(movie_card, text=movie["title"], font=("Times New Roman", 14, "bold"), foreground=theme["accent"], anchor="center")
-            title.pack(pady=10)
-
-            rating = ttk.Label(movie_card, text=f"Rating: {movie['rating']}", font=("Times New Roman", 12), anchor="center")
-            rating.pack(pady=5)
-
-            genres = ttk.Label(movie_card, text=", ".join(movie["genres"]), font=("Times New Roman", 12), anchor="center")
-            genres.pack(pady=5)
-
-            match_score = ttk.Label(movie_card, text=f"Match: {movie['match_score']}%", font=("Times New Roman", 12), anchor="center")
-            match_score.pack(pady=5)
-
-            movie_card.pack_propagate(False)
-            movie_card.pack()
+        movie_card = tk.Frame(parent, bg=theme["secondary"], relief="flat", width=200, height=300)
+        movie_card.pack_propagate(False)  # Prevent the card from resizing
+        movie_card.pack(padx=20, pady=20)
+
+        labels = {
+            "title": ttk.Label(movie_card, font=("Times New Roman", 14, "bold"), foreground=theme["accent"], anchor="center", wraplength=190),
+            "rating": ttk.Label(movie_card, font=("Times New Roman", 12), anchor="center"),
+            "genres": ttk.Label(movie_card, font=("Times New Roman", 12), anchor="center", wraplength=190),
+            "match_score": ttk.Label(movie_card, font=("Times New Roman", 12), anchor="center"),
+        }
+        labels["title"].pack(pady=10)
+        for key in ("rating", "genres", "match_score"):
+            labels[key].pack(pady=5)
+        labels["watched"] = ttk.Button(movie_card, text="Mark Watched")
+        labels["watched"].pack(side=tk.BOTTOM, pady=10)
+        return labels
+
+    def fill_movie_card(self, labels, rec):
+        movie = self.catalog.movie(rec.movie_id)
+        labels["title"].configure(text=movie["title"])
+        labels["rating"].configure(text=f"Rating: {movie['rating']}")
+        labels["genres"].configure(text=", ".join(movie["genres"]))
+        labels["match_score"].configure(text=f"Match: {rec.score}%")
+        labels["watched"].configure(command=lambda: self.mark_watched(rec.movie_id))
 
-        # Add refresh button
-        ttk.Button(self.recommendations_frame, text="Refresh", command=self.refresh_recommendations, style='Accent.TButton').pack(pady=20)
+    def display_recommendations(self):
+        with metrics.span("display_recommendations"):
+            self.loading_frame.pack_forget()
+            self.recommendations_grid.set_items(self.recommendations)
 
     def refresh_recommendations(self):
         self.generate_recommendations()
 
+    def apply_filters(self):
+        from facets import Filters
+        values = {key: var.get().strip() for key, var in self.filter_vars.items()}
+        try:
+            self.filters = Filters.from_dict({key: value for key, value in values.items() if value})
+        except ValueError:
+            messagebox.showerror("Error", "Filters must be numbers, e.g. From year 2000, Max minutes 120, Min rating 8.5")
+            return
+        self.generate_recommendations()
+
     def create_watched_tab(self, parent):
         theme = self.themes[self.current_theme]
-        for widget in parent.winfo_children():
-            widget.destroy()
-
-        ttk.Label(parent, text="Watched Movies", font=theme["font_title"], foreground=theme["accent"]).pack(pady=30)
 
-        if not self.current_user["watched_movies"]:
-            ttk.Label(parent, text="You haven't marked any movies as watched yet.", font=theme["font_body"]).pack()
+        ttk.Label(parent, text="Watched Movies", font=theme["font_title"], foreground=theme["accent"]).pack(pady=(30, 10))
+
+        # Type-ahead title search; hits can be marked watched directly
+        search_frame = ttk.Frame(parent)
+        search_frame.pack(fill=tk.X, padx=30, pady=(0, 10))
+        ttk.Label(search_frame, text="Search titles", font=theme["font_body"]).pack(side=tk.LEFT, padx=(0, 10))
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        ttk.Entry(search_frame, textvariable=self.search_var, foreground="black").pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.search_status = ttk.Label(search_frame, font=theme["font_body"])
+        self.search_status.pack(side=tk.LEFT, padx=10)
+        self.search_results = VirtualGrid(
+            parent, cell_height=36,
+            make_cell=self.make_search_row, fill_cell=self.fill_search_row,
+        )
+        self.search_results.pack_propagate(False)  # height is set per query
+
+        self.watched_list_frame = ttk.Frame(parent)
+        self.watched_list_frame.pack(expand=True, fill=tk.BOTH)
+        # both are built once; refreshing swaps between them and refills the grid's pool
+        self.watched_empty = ttk.Label(self.watched_list_frame, text="You haven't marked any movies as watched yet.",
+                                       font=theme["font_body"])
+        self.watched_list = VirtualGrid(
+            self.watched_list_frame, cell_height=26,
+            make_cell=self.make_watched_row,
+            fill_cell=lambda label, title: label.configure(text=title),
+        )
+        self.refresh_watched_list()
+
+    def refresh_watched_list(self):
+        watched = self.current_user["watched_movies"]
+        # winfo_manager() is "" while a widget is not packed
+        if not watched and not self.watched_empty.winfo_manager():
+            self.watched_list.pack_forget()
+            self.watched_empty.pack()
+        elif watched and not self.watched_list.winfo_manager():
+            self.watched_empty.pack_forget()
+            self.watched_list.pack(expand=True, fill=tk.BOTH, padx=30, pady=(0, 20))
+        self.watched_list.set_items(watched)
+
+    def make_watched_row(self, parent):
+        label = ttk.Label(parent, font=self.themes[self.current_theme]["font_body"])
+        label.pack(anchor="w")
+        return label
+
+    def schedule_search(self):
+        # debounce: a query only runs once typing pauses for search_delay_ms
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(self.search_delay_ms, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        query = self.search_var.get().strip()
+        if not query:
+            self.search_status.configure(text="")
+            self.search_results.pack_forget()
+            return
+        if not self.search_ready.is_set():
+            self.search_status.configure(text="Indexing titles...")
+            self.search_job = self.root.after(200, self.run_search)
+            return
+
+        hits = self.catalog.search(query, k=self.search_result_count)
+        self.search_status.configure(text="" if hits else "No matches")
+        if not hits:
+            self.search_results.pack_forget()
+            return
+        self.search_results.configure(height=self.search_results.cell_height * min(len(hits), 6))
+        self.search_results.pack(fill=tk.X, padx=30, pady=(0, 10), before=self.watched_list_frame)
+        self.search_results.set_items(hits)
+
+    def make_search_row(self, parent):
+        label = ttk.Label(parent, font=self.themes[self.current_theme]["font_body"])
+        label.pack(side=tk.LEFT, anchor="w")
+        button = ttk.Button(parent, text="Mark Watched")
+        button.pack(side=tk.RIGHT)
+        return label, button
+
+    def fill_search_row(self, row, hit):
+        label, button = row
+        movie_id, _ = hit
+        movie = self.catalog.movie(movie_id)
+        label.configure(text=f"{movie['title']} ({movie['year']})")
+        if movie_id in self.watched:
+            button.configure(text="Watched", state=tk.DISABLED)
         else:
-            for title in self.current_user["watched_movies"]:
-                ttk.Label(parent, text=title, font=theme["font_body"]).pack(anchor="w", padx=30)
+            button.configure(text="Mark Watched", state=tk.NORMAL, command=lambda: self.mark_watched(movie_id))
 
     def logout(self):
+        # drop any recommendation request still in flight for this user
+        self.request_id += 1
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+
+        # the profile stays in the store, and the session in memory while the
+        # budget allows, so the user can log back in
         self.current_user = None
-        try:
-            os.remove('cinemate_user.json')
-        except FileNotFoundError:
-            pass
+        self.session = None
+        self.store.set_current(None)
+        self.store.flush()
         self.create_login_interface()
 
+    def on_close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.store is not None:
+            self.store.close()
+        self.root.destroy()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CineMate - AI Movie Recommendations")
+    parser.add_argument("--catalog", default=os.environ.get("CINEMATE_CATALOG"),
+                        help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--neighbors", default=os.environ.get("CINEMATE_NEIGHBORS"),
+                        help="item-item neighbor table from collaborative.py (.npz)")
+    parser.add_argument("--ann", default=os.environ.get("CINEMATE_ANN"),
+                        help="embedding ANN index from embeddings.py (.npz)")
+    parser.add_argument("--model", default=os.environ.get("CINEMATE_MODEL"),
+                        help="matrix factorization model from factorization.py (.npz)")
+    parser.add_argument("--metrics-port", type=int, default=os.environ.get("CINEMATE_METRICS_PORT"),
+                        help="serve timing spans and counters on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--session-memory-mb", type=float, default=os.environ.get("CINEMATE_SESSION_MB", 256),
+                        help="memory kept for logged-out users' sessions before the least recent are dropped")
+    parser.add_argument("--timing", action="store_true",
+                        default=os.environ.get("CINEMATE_TIMING", "") not in ("", "0"),
+                        help="print how long each startup stage took to stderr")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = CineMate(root)
+    app = CineMate(root, catalog_path=args.catalog, neighbors_path=args.neighbors,
+                   ann_path=args.ann, model_path=args.model, timing=args.timing,
+                   session_budget=int(float(args.session_memory_mb) * 2**20))
+    if args.metrics_port:
+        metrics.enabled = True
+        metrics.serve(args.metrics_port, gauges=app.gauges)
     root.mainloop()
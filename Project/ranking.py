@@ -0,0 +1,151 @@
+import numpy as np
+
+from instrumentation import metrics
+from scoring import JITTER_MAX, MINOR_AGE
+
+
+class LiveRanking:
+    """One user's shortlist, patched as movies are appended to watched_movies.
+
+    Watching a movie changes no genre or rating score: it only removes that
+    movie and, with a neighbour table, changes the collaborative boost of
+    the movies in the history's neighbour lists. So an update drops the
+    movie from the shortlist and rescores just the boosted neighbours,
+    instead of going back over the genre candidates.
+
+    The shortlist is built `reserve` places deeper than k and remembers the
+    score it was cut at, or the score every movie left out of the candidates
+    is below if that is higher. Every movie outside it scores below that cut,
+    so as long as the k-th best remaining score is more than JITTER_MAX above
+    it, the top k are all inside. When that no longer holds it is rebuilt
+    from scratch.
+    ANN candidates and the learned model depend on the whole history, so
+    with either of those every update is a plain recommend() call. Either
+    way top() returns what Recommender.recommend would for the same
+    history and seed.
+    """
+
+    # extra shortlist depth, roughly how many movies can be marked watched between rebuilds
+    reserve = 16
+
+    def __init__(self, recommender, profile, k=5, watched=None, filters=None):
+        self.recommender = recommender
+        self.scorer = recommender.scorer
+        self.k = k
+        self.filters = filters
+        # candidates for the ANN and the model come from the whole history
+        self.patchable = recommender.ann is None and recommender.model is None
+        self.rebuild(profile, watched)
+
+    def rebuild(self, profile, watched=None):
+        """Score the profile from scratch."""
+        catalog = self.recommender.catalog
+        self.profile = profile
+        # a caller's set is shared rather than copied; they keep it in step with the profile
+        self.watched = watched if watched is not None else catalog.watched_set(profile.watched_movies)
+        if not self.patchable:
+            return
+        metrics.count("ranking_rebuilds")
+        self.history = self.scorer.watched_ids(profile.watched_movies)
+        # the same candidates recommend() would use, so the shortlists agree;
+        # every movie left out of them scores below floor
+        genre = self.scorer.genre_candidates(profile, self.filters)
+        candidates, floor = self.scorer.top_up(profile, genre, self.k + len(self.watched), self.filters)
+        depth = self.k + self.reserve
+        self.ids, scores = self.scorer.shortlist(profile, depth, self.watched, self.boost(), candidates, self.filters)
+        # boosts are rescaled as the history grows, so keep the unboosted scores
+        self.base = self.scorer.base_scores(profile, self.ids)
+        self.scores = scores
+        self.cutoff = floor
+        if len(scores) >= depth:
+            self.cutoff = max(floor, np.partition(scores, len(scores) - depth)[len(scores) - depth] - JITTER_MAX)
+
+    def nbytes(self):
+        """Approximate memory held by the ranking, not counting the watched set it shares."""
+        if not self.patchable:
+            return 0
+        return self.ids.nbytes + self.base.nbytes + self.scores.nbytes + self.history.nbytes
+
+    def boost(self):
+        neighbors = self.recommender.neighbors
+        return neighbors.boost(self.history) if neighbors is not None else None
+
+    def update(self, profile, watched=None):
+        """Catch up with titles appended to profile.watched_movies since the last call.
+
+        A profile whose genres, age band or earlier history differ is rebuilt.
+        """
+        old, new = self.profile, profile
+        same_user = (
+            sorted(old.genres) == sorted(new.genres)
+            and (old.age < MINOR_AGE) == (new.age < MINOR_AGE)
+            and new.watched_movies[:len(old.watched_movies)] == old.watched_movies
+        )
+        if not same_user or not self.patchable:
+            self.rebuild(profile, watched)
+            return
+        with metrics.span("ranking_update"):
+            added = self.scorer.watched_ids(new.watched_movies[len(old.watched_movies):])
+            self.profile = profile
+            if watched is not None:
+                self.watched = watched
+            else:
+                self.watched.update(added)
+            if len(added):
+                self.history = np.concatenate([self.history, added])
+                self.mark_watched(added)
+            if not self.complete():
+                self.rebuild(profile, watched)
+
+    def mark_watched(self, movie_ids):
+        pos = np.searchsorted(self.ids, movie_ids)
+        if len(self.ids):
+            pos = pos[(pos < len(self.ids)) & (self.ids[np.minimum(pos, len(self.ids) - 1)] == movie_ids)]
+        else:
+            pos = pos[:0]
+        self.ids = np.delete(self.ids, pos)
+        self.base = np.delete(self.base, pos)
+        boost = self.boost()
+        if boost is None or not len(boost[0]):
+            self.scores = np.delete(self.scores, pos)
+            return
+
+        # neighbours that were never shortlisted (or were cut) may now make it
+        boost_ids, points = boost
+        if self.filters:
+            keep = self.scorer.facets.mask(self.filters)[boost_ids]
+            boost_ids, points = boost_ids[keep], points[keep]
+        keep = ~self.watched.contains_many(boost_ids)
+        boost_ids, points = boost_ids[keep], points[keep]
+        new = np.setdiff1d(boost_ids, self.ids, assume_unique=True)
+        if len(new):
+            metrics.count("candidates_scored", len(new))
+            at = np.searchsorted(self.ids, new)
+            self.ids = np.insert(self.ids, at, new)
+            self.base = np.insert(self.base, at, self.scorer.base_scores(self.profile, new))
+        self.scores = self.base.copy()
+        self.scores[np.searchsorted(self.ids, boost_ids)] += points
+
+    def complete(self):
+        """Whether the shortlist still holds every movie that can reach the top k."""
+        if self.cutoff == -np.inf:
+            return True
+        if len(self.scores) <= self.k:
+            return False
+        kth = np.partition(self.scores, len(self.scores) - self.k)[len(self.scores) - self.k]
+        return kth - JITTER_MAX >= self.cutoff
+
+    def shortlist(self):
+        """(ids, scores) exactly as Recommender.recommend would shortlist them."""
+        ids, scores = self.ids, self.scores
+        if 0 < self.k < len(scores):
+            kth = np.partition(scores, len(scores) - self.k)[len(scores) - self.k]
+            keep = scores >= kth - JITTER_MAX
+            ids, scores = ids[keep], scores[keep]
+        return ids, scores
+
+    def top(self, seed=None):
+        """The current top k with fresh jitter (reproducible with seed)."""
+        if not self.patchable:
+            return self.recommender.recommend(self.profile, self.k, self.watched, seed, self.filters)
+        return self.scorer.apply_jitter(*self.shortlist(), self.k, seed)
@@ -0,0 +1,146 @@
+import numpy as np
+
+from cache import RecommendationCache, profile_key
+from catalog import load_catalog
+from instrumentation import metrics
+from ranking import LiveRanking
+from scoring import Recommendation, ScoringEngine
+
+
+class UserProfile:
+    """The scoring-relevant part of a cinemate_user.json profile."""
+
+    __slots__ = ("email", "genres", "age", "watched_movies")
+
+    def __init__(self, genres, age, watched_movies=(), email=None):
+        self.email = email
+        self.genres = list(genres)
+        self.age = int(age)
+        self.watched_movies = list(watched_movies)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError("profile must be an object")
+        genres = data.get("genres", [])
+        watched_movies = data.get("watched_movies", [])
+        # a bare string would otherwise be taken one character per item
+        for name, value in (("genres", genres), ("watched_movies", watched_movies)):
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError(f"{name} must be a list of strings")
+        return cls(
+            genres=genres,
+            age=data["age"],
+            watched_movies=watched_movies,
+            email=data.get("email"),
+        )
+
+    def __getitem__(self, key):
+        # lets the scoring engine accept profiles and plain dicts alike
+        return getattr(self, key)
+
+
+class Recommender:
+    """Headless recommendation API: catalog + scorer + top-k, no tkinter needed."""
+
+    # ANN hits fetched per request before exact rescoring
+    ann_candidates = 200
+
+    def __init__(self, catalog, cache_size=1024, cache_ttl=300, neighbors=None, ann=None, model=None):
+        self.catalog = catalog
+        self.scorer = ScoringEngine(catalog)
+        # optional ItemNeighbors table blended in as a collaborative signal
+        if neighbors is not None and len(neighbors) != len(catalog):
+            raise ValueError("Neighbor table was built for a different catalog")
+        self.neighbors = neighbors
+        # optional EmbeddingIndex; when set it replaces genre-index candidate generation
+        if ann is not None and len(ann) != len(catalog):
+            raise ValueError("Embedding index was built for a different catalog")
+        self.ann = ann
+        # optional ImplicitALS model; replaces the hand-tuned score for users with a history
+        if model is not None and len(model.item_factors) != len(catalog):
+            raise ValueError("Model was trained for a different catalog")
+        self.model = model
+        # holds the deterministic shortlist; jitter is reapplied on every call
+        self.cache = RecommendationCache(cache_size, cache_ttl)
+
+    @classmethod
+    def from_path(cls, catalog_path=None, neighbors_path=None, ann_path=None, model_path=None, **kwargs):
+        if neighbors_path is not None:
+            from collaborative import ItemNeighbors
+            kwargs["neighbors"] = ItemNeighbors.load(neighbors_path)
+        if ann_path is not None:
+            from embeddings import EmbeddingIndex
+            kwargs["ann"] = EmbeddingIndex.load(ann_path)
+        if model_path is not None:
+            from factorization import ImplicitALS
+            kwargs["model"] = ImplicitALS.load(model_path)
+        return cls(load_catalog(catalog_path), **kwargs)
+
+    def recommend(self, profile, k=5, watched=None, seed=None, filters=None):
+        """Top-k for a profile; watched is a WatchedSet, built from the profile's titles if omitted.
+
+        The same profile and seed always give the same result; seed=None jitters randomly.
+        filters is an optional facets.Filters limiting year, duration and rating.
+        """
+        with metrics.span("recommend"):
+            return self._recommend(profile, k, watched, seed, filters)
+
+    def _recommend(self, profile, k, watched, seed, filters):
+        if isinstance(profile, dict):
+            profile = UserProfile.from_dict(profile)
+        if watched is None:
+            watched = self.catalog.watched_set(profile.watched_movies)
+        if self.model is not None and profile.watched_movies:
+            return self.recommend_learned(profile, k, filters)
+        key = profile_key(profile, k, self.catalog.version, watched.fingerprint(), filters)
+        shortlist = self.cache.get(key)
+        if shortlist is None:
+            history = self.scorer.watched_ids(profile.watched_movies)
+            boost = None
+            if self.neighbors is not None:
+                with metrics.span("cf_boost"):
+                    boost = self.neighbors.boost(history)
+            candidates = None
+            if self.ann is not None:
+                with metrics.span("ann_search"):
+                    query = self.ann.user_vector(self.catalog.user_genre_ids(profile.genres), history)
+                    candidates, _ = self.ann.search(query, max(self.ann_candidates, k) + len(history))
+            shortlist = self.scorer.shortlist(profile, k, watched, boost, candidates, filters)
+            self.cache.put(key, shortlist)
+        return self.scorer.apply_jitter(*shortlist, k, seed)
+
+    def ranking(self, profile, k=5, watched=None, filters=None):
+        """A LiveRanking for the profile: call update() as movies are watched, top() to read it."""
+        if isinstance(profile, dict):
+            profile = UserProfile.from_dict(profile)
+        return LiveRanking(self, profile, k, watched, filters)
+
+    def recommend_learned(self, profile, k=5, filters=None):
+        # folding the current history in keeps newly watched movies effective
+        # immediately, without retraining the model
+        history = self.scorer.watched_ids(profile.watched_movies)
+        with metrics.span("model_recommend"):
+            items = self.scorer.facets.select(filters) if filters else None
+            ids, scores = self.model.recommend(self.model.fold_in(history), k, exclude=history, items=items)
+        # implicit ALS predicts preference on a 0-1 scale
+        return [Recommendation(i, min(100, max(0, s * 100))) for i, s in zip(ids, scores) if s != -np.inf]
+
+    def movie_json(self, rec):
+        """A Recommendation as the movie's fields plus its id and match score."""
+        movie = self.catalog.movie(rec.movie_id)
+        movie["movie_id"] = rec.movie_id
+        movie["match_score"] = rec.score
+        return movie
+
+    def recommend_json(self, profile, k=5, seed=None, filters=None):
+        return [self.movie_json(rec) for rec in self.recommend(profile, k, seed=seed, filters=filters)]
+
+    def search_json(self, query, k=10):
+        results = []
+        for movie_id, score in self.catalog.search(query, k):
+            movie = self.catalog.movie(movie_id)
+            movie["movie_id"] = movie_id
+            movie["search_score"] = round(score, 3)
+            results.append(movie)
+        return results
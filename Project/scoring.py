@@ -0,0 +1,389 @@
+import threading
+import uuid
+
+import numpy as np
+
+from bitset import WatchedSet
+from facets import FacetIndex
+from genre_index import GenreIndex
+from instrumentation import metrics
+from search import TitleIndex
+
+# Same constants as the original per-movie loop in CineMate
+GENRE_POINTS = 30
+RATING_WEIGHT = 2
+MINOR_AGE = 18
+MINOR_RATING_LIMIT = 8.5
+MINOR_PENALTY = 10
+JITTER_MAX = 20
+MAX_SCORE = 100
+
+
+def jitter(size, seed=None):
+    """The 0..JITTER_MAX random bonus for size movies, drawn in one call.
+
+    The same seed always gives the same vector, so a profile scored with a
+    fixed seed ranks identically every time; seed=None draws fresh entropy.
+    """
+    return np.random.default_rng(seed).integers(0, JITTER_MAX + 1, size=size, dtype=np.uint8)
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+class Recommendation:
+    """One ranked result: a movie id and its match score, never mutated after creation."""
+
+    __slots__ = ("movie_id", "score")
+
+    def __init__(self, movie_id, score):
+        object.__setattr__(self, "movie_id", int(movie_id))
+        object.__setattr__(self, "score", round(float(score), 1))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Recommendation is immutable")
+
+    def __reduce__(self):
+        # pickle and copy through __init__, since attributes cannot be set afterwards
+        return Recommendation, (self.movie_id, self.score)
+
+    def __repr__(self):
+        return f"Recommendation(movie_id={self.movie_id}, score={self.score})"
+
+
+class MovieCatalog:
+    """Columnar view of the movie list: one array per field plus a multi-hot genre matrix."""
+
+    def __init__(self, titles, genre_names, genre_matrix, rating, year, duration, version=None):
+        # The catalog is shared read-only between requests and threads
+        self.titles = tuple(titles) if isinstance(titles, list) else titles
+        self.genre_names = tuple(genre_names)
+        self.genre_ids = {g: i for i, g in enumerate(self.genre_names)}
+        self.genre_matrix = _read_only(genre_matrix)  # shape (movies, genres), uint8 0/1
+        self.rating = _read_only(rating)
+        self.year = _read_only(year)
+        self.duration = _read_only(duration)
+        # identifies this catalog's contents, e.g. for cache keys
+        self.version = version or uuid.uuid4().hex
+        self._title_ids = None
+        self._title_index = None
+        self._title_index_lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records, version=None):
+        genre_names = []
+        genre_ids = {}
+        for m in records:
+            for g in m["genres"]:
+                if g not in genre_ids:
+                    genre_ids[g] = len(genre_names)
+                    genre_names.append(g)
+
+        n = len(records)
+        genre_matrix = np.zeros((n, len(genre_names)), dtype=np.uint8)
+        for i, m in enumerate(records):
+            for g in m["genres"]:
+                genre_matrix[i, genre_ids[g]] = 1
+
+        return cls(
+            titles=[m["title"] for m in records],
+            genre_names=genre_names,
+            genre_matrix=genre_matrix,
+            rating=np.array([m["rating"] for m in records], dtype=np.float32),
+            year=np.array([m["year"] for m in records], dtype=np.int16),
+            duration=np.array([m["duration"] for m in records], dtype=np.int16),
+            version=version,
+        )
+
+    def __len__(self):
+        return len(self.rating)
+
+    def genres_of(self, movie_id):
+        row = self.genre_matrix[movie_id]
+        return [self.genre_names[g] for g in np.flatnonzero(row)]
+
+    def movie(self, movie_id):
+        # Materialize a single movie in the same shape as the old movie_db entries
+        return {
+            "title": self.titles[movie_id],
+            "genres": self.genres_of(movie_id),
+            "rating": round(float(self.rating[movie_id]), 1),
+            "year": int(self.year[movie_id]),
+            "duration": int(self.duration[movie_id]),
+        }
+
+    def find(self, title):
+        """Movie id for an exact title, or None."""
+        if self._title_ids is None:
+            # built on first use; first occurrence wins for duplicate titles
+            title_ids = {}
+            for i, t in enumerate(self.titles):
+                title_ids.setdefault(t, i)
+            self._title_ids = title_ids
+        return self._title_ids.get(title)
+
+    def title_index(self):
+        """The TitleIndex over all titles, built on first use (seconds for millions of titles)."""
+        if self._title_index is None:
+            with self._title_index_lock:
+                if self._title_index is None:
+                    self._title_index = TitleIndex.build(self.titles)
+        return self._title_index
+
+    def search(self, query, k=10):
+        """Up to k (movie id, score) title matches for a type-ahead query, best first."""
+        with metrics.span("title_search"):
+            ids, scores = self.title_index().search(query, k)
+        return list(zip(ids.tolist(), scores.tolist()))
+
+    def watched_set(self, titles):
+        ids = [self.find(t) for t in titles]
+        return WatchedSet.from_ids(len(self), [i for i in ids if i is not None])
+
+    def user_genre_ids(self, genres):
+        return sorted({self.genre_ids[g] for g in genres if g in self.genre_ids})
+
+    def user_genre_vector(self, genres):
+        vec = np.zeros(len(self.genre_names), dtype=np.float32)
+        vec[self.user_genre_ids(genres)] = 1
+        return vec
+
+
+class ScoringEngine:
+    """Scores the whole catalog for one user in a single batched operation."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        # rating x2 is user independent, so it is computed once up front
+        self.rating_points = catalog.rating.astype(np.float32) * RATING_WEIGHT
+        self.minor_penalty = np.where(catalog.rating > MINOR_RATING_LIMIT, MINOR_PENALTY, 0).astype(np.float32)
+        self.index = GenreIndex(catalog)
+        self._fill_orders = {}
+        self._facets = None
+
+    @property
+    def facets(self):
+        # sorting three columns is only worth it once someone filters
+        if self._facets is None:
+            self._facets = FacetIndex(self.catalog)
+        return self._facets
+
+    def base_scores(self, user, ids=None):
+        """Deterministic (pre-jitter, unclamped) scores for the given movie ids, or all movies."""
+        catalog = self.catalog
+        genre_ids = catalog.user_genre_ids(user["genres"])
+        # summing the user's few genre columns avoids casting the whole
+        # uint8 matrix to float for a matrix product
+        if ids is None or len(ids) > len(catalog) // 8:
+            matches = catalog.genre_matrix[:, genre_ids].sum(axis=1, dtype=np.float32)
+            if ids is not None:
+                matches = matches[ids]
+        else:
+            matches = catalog.genre_matrix[ids][:, genre_ids].sum(axis=1, dtype=np.float32)
+        rating_points = self.rating_points if ids is None else self.rating_points[ids]
+        scores = matches * GENRE_POINTS + rating_points
+        if user["age"] < MINOR_AGE:
+            scores -= self.minor_penalty if ids is None else self.minor_penalty[ids]
+        return scores
+
+    def score(self, user, ids=None, seed=None):
+        """Match scores for the given movie ids (all movies when ids is None)."""
+        scores = self.base_scores(user, ids)
+        scores += jitter(len(scores), seed)
+        return np.clip(scores, 0, MAX_SCORE)
+
+    def genre_candidates(self, user, filters=None):
+        """Movies sharing a genre with the user, restricted to filters if given."""
+        genre_ids = self.catalog.user_genre_ids(user["genres"])
+        if not filters:
+            return self.index.candidates(genre_ids)
+        # a narrow facet range is walked directly and checked for genres;
+        # otherwise the genre postings go through the (cached) facet mask
+        postings = sum(len(self.index.postings[g]) for g in genre_ids)
+        if self.facets.estimate(filters) * 8 < postings:
+            ids = self.facets.select(filters)
+            return ids[self.catalog.genre_matrix[ids][:, genre_ids].any(axis=1)]
+        return self.index.candidates(genre_ids, allowed=self.facets.mask(filters))
+
+    def _fill_scores(self, user):
+        # what movies outside the user's genres score: rating points less any minor penalty
+        if user["age"] < MINOR_AGE:
+            return self.rating_points - self.minor_penalty
+        return self.rating_points
+
+    def _fill_order(self, user):
+        # one stable sort per age band, shared by every unfiltered top-up
+        minor = user["age"] < MINOR_AGE
+        order = self._fill_orders.get(minor)
+        if order is None:
+            order = self._fill_orders[minor] = np.argsort(-self._fill_scores(user), kind="stable")
+        return order
+
+    def candidates(self, user, k, filters=None):
+        """Genre candidates plus any other movie that can reach the top k, restricted to filters if given."""
+        return self.top_up(user, self.genre_candidates(user, filters), k, filters)[0]
+
+    def top_up(self, user, ids, k, filters=None):
+        """(ids plus the other movies that can reach the top k, a score every movie left out is below).
+
+        ids are the genre candidates. Movies outside the user's genres score
+        their rating points less any minor penalty, and a genre match scores
+        at least GENRE_POINTS more than that, which bounds the k-th best score
+        from below. Jitter can lift any other movie within JITTER_MAX of the
+        bound into the top k, so those are added, best first, and at least
+        enough of them to make k ids.
+        """
+        if k <= 0:
+            return ids, -np.inf
+        scores = self._fill_scores(user)
+        order = self._fill_order(user)
+        if len(ids) >= k:
+            lower = scores[ids] + GENRE_POINTS
+            bound = np.partition(lower, len(lower) - k)[len(lower) - k]
+            if bound - JITTER_MAX > scores[order[0]]:
+                return ids, bound - JITTER_MAX
+        if filters:
+            rest = np.setdiff1d(self.facets.select(filters), ids, assume_unique=True)
+            rest = rest[np.lexsort((rest, -scores[rest]))]
+        else:
+            taken = np.zeros(len(self.catalog), dtype=bool)
+            taken[ids] = True
+            rest = order[~taken[order]]
+        need = k - len(ids)
+        if need >= len(rest):
+            return np.sort(np.concatenate([ids, rest])), -np.inf
+        if need > 0:
+            bound = scores[rest[need - 1]]
+        ranked = -scores[rest]
+        count = np.searchsorted(ranked, JITTER_MAX - bound, side="right")
+        floor = bound - JITTER_MAX if count < len(rest) else -np.inf
+        return np.sort(np.concatenate([ids, rest[:count]])), floor
+
+    def shortlist(self, user, k=5, watched=None, boost=None, candidates=None, filters=None):
+        """Movies that can still reach the top k once jitter is added, in id order.
+
+        Jitter adds at most JITTER_MAX, so anything scoring more than that below
+        the k-th best base score can never make the cut. The result is
+        deterministic for a given profile and catalog, which makes it cacheable.
+        Movies in the watched bitset are left out. boost is an optional
+        (movie ids, points) pair, e.g. collaborative filtering scores, added
+        on top of the genre/rating score; boosted movies are candidates too.
+        candidates, if given, replaces genre-index retrieval (e.g. ANN hits).
+        filters (a facets.Filters) drops movies outside its year, duration
+        and rating ranges before anything is scored.
+        """
+        # Only movies sharing a genre with the user can earn the genre bonus,
+        # so scoring is limited to the genre candidates (plus best-scoring fill).
+        # The fill asks for extra ids so k remain after dropping watched ones.
+        with metrics.span("candidates"):
+            if candidates is None:
+                ids = self.candidates(user, k + (len(watched) if watched is not None else 0), filters)
+            else:
+                ids = np.unique(candidates)
+            if boost is not None:
+                ids = np.union1d(ids, boost[0])
+            if filters and (boost is not None or candidates is not None):
+                ids = ids[self.facets.mask(filters)[ids]]
+            if watched is not None:
+                ids = ids[~watched.contains_many(ids)]
+            if filters and candidates is not None and len(ids) < k:
+                # the given candidates (e.g. ANN hits) missed the filter range;
+                # fall back to the genre candidates within it
+                fallback = self.candidates(user, k + (len(watched) if watched is not None else 0), filters)
+                if watched is not None:
+                    fallback = fallback[~watched.contains_many(fallback)]
+                ids = np.union1d(ids, fallback)
+        metrics.count("candidates_scored", len(ids))
+        with metrics.span("score"):
+            base = self.base_scores(user, ids)
+        if boost is not None and len(boost[0]):
+            boost_ids, points = boost
+            pos = np.searchsorted(ids, boost_ids)
+            hit = (pos < len(ids)) & (ids[np.minimum(pos, len(ids) - 1)] == boost_ids)
+            base[pos[hit]] += points[hit]
+        if 0 < k < len(base):
+            kth = np.partition(base, len(base) - k)[len(base) - k]
+            keep = base >= kth - JITTER_MAX
+            ids, base = ids[keep], base[keep]
+        return ids, base
+
+    def apply_jitter(self, ids, base, k=5, seed=None):
+        """Add the random jitter to a shortlist and pick the final top k."""
+        with metrics.span("select"):
+            return self._select(ids, base, k, seed)
+
+    def _select(self, ids, base, k, seed):
+        scores = base + jitter(len(base), seed)
+        np.clip(scores, 0, MAX_SCORE, out=scores)
+        top = np.arange(len(scores))
+        if 0 < k < len(scores):
+            # only the k best need sorting; ids are ascending, so the first
+            # ties at the cut-off are the lowest ids
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            above = np.flatnonzero(scores > kth)
+            tied = np.flatnonzero(scores == kth)[:k - len(above)]
+            top = np.concatenate([above, tied])
+        # ties keep catalog order, like sorted() did in the original loop
+        top = top[np.lexsort((ids[top], -scores[top]))][:k]
+        return [Recommendation(ids[i], scores[i]) for i in top]
+
+    def top_k(self, user, k=5, watched=None, seed=None, filters=None):
+        return self.apply_jitter(*self.shortlist(user, k, watched, filters=filters), k, seed)
+
+    def watched_ids(self, titles):
+        ids = (self.catalog.find(t) for t in titles)
+        return np.array([i for i in ids if i is not None], dtype=np.int64)
+
+    def top_k_batch(self, users, k=5, watched=None, seeds=None):
+        """Top-k for many users at once from one users x movies score matrix.
+
+        Watched movies are excluded: watched holds one id array per user, and
+        is looked up from each user's watched_movies titles when not given.
+        seeds, one per user, make each user's jitter reproducible regardless
+        of how users are chunked.
+        """
+        if not users:
+            return []
+        metrics.count("candidates_scored", len(users) * len(self.catalog))
+        catalog = self.catalog
+        n = len(catalog)
+        if watched is None:
+            watched = [self.watched_ids(u["watched_movies"]) for u in users]
+
+        # everything is done in place, row by row, so the score matrix is
+        # the only users x movies allocation
+        scores = np.empty((len(users), n), dtype=np.float32)
+        for row, user in enumerate(users):
+            out = scores[row]
+            genre_ids = catalog.user_genre_ids(user["genres"])
+            catalog.genre_matrix[:, genre_ids].sum(axis=1, dtype=np.float32, out=out)
+            out *= GENRE_POINTS
+            out += self.rating_points
+            if user["age"] < MINOR_AGE:
+                out -= self.minor_penalty
+            out += jitter(n, None if seeds is None else seeds[row])
+            np.clip(out, 0, MAX_SCORE, out=out)
+            out[watched[row]] = -np.inf
+
+        k = min(k, n)
+        if k == 0:
+            return [[] for _ in users]
+        top = np.empty((len(users), k), dtype=np.int64)
+        for row, out in enumerate(scores):
+            if k == n:
+                top[row] = np.arange(n)
+                continue
+            # as in _select, ties at the cut-off go to the lowest ids
+            kth = np.partition(out, n - k)[n - k]
+            above = np.flatnonzero(out > kth)
+            top[row] = np.sort(np.concatenate([above, np.flatnonzero(out == kth)[:k - len(above)]]))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [Recommendation(m, s) for m, s in zip(row_ids, row_scores) if s != -np.inf]
+            for row_ids, row_scores in zip(top, top_scores)
+        ]
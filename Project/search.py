@@ -0,0 +1,231 @@
+import math
+
+import numpy as np
+
+# Titles are folded to a 38 symbol alphabet: separator, a-z, 0-9 and one
+# symbol for every non-ASCII byte, so a trigram fits in a small integer code
+ALPHABET = 38
+SEPARATOR = 0
+OTHER = 37
+CHARS = np.frombuffer(b" abcdefghijklmnopqrstuvwxyz0123456789~", dtype=np.uint8)
+
+_FOLD = np.zeros(256, dtype=np.uint8)
+_FOLD[128:] = OTHER
+for _i, _c in enumerate(b"abcdefghijklmnopqrstuvwxyz"):
+    _FOLD[_c] = _FOLD[_c - 32] = 1 + _i
+for _i, _c in enumerate(b"0123456789"):
+    _FOLD[_c] = 27 + _i
+# U+00C0..U+00FF (UTF-8 C3 80..C3 BF) fold to their unaccented letter
+_LATIN1 = _FOLD[np.frombuffer(b"aaaaaaaceeeeiiiidnooooo ouuuuytsaaaaaaaceeeeiiiidnooooo ouuuuyty", dtype=np.uint8)]
+
+# Sort keys only need enough of a title for type-ahead prefixes
+KEY_WIDTH = 48
+ARTICLES = (b"the ", b"a ", b"an ")
+
+
+def _fold(blob, offsets):
+    """Fold UTF-8 title bytes and collapse separator runs.
+
+    Returns (symbols, new offsets): punctuation and whitespace become a
+    single separator, Latin-1 accents are dropped (é -> e), and
+    leading/trailing separators are removed.
+    """
+    symbols = _FOLD[blob]
+    accented = np.flatnonzero(blob[:-1] == 0xC3)
+    accented = accented[(blob[accented + 1] >= 0x80) & (blob[accented + 1] <= 0xBF)]
+    symbols[accented + 1] = _LATIN1[blob[accented + 1] - 0x80]
+    n = len(offsets) - 1
+    title_of = np.repeat(np.arange(n), np.diff(offsets))
+    keep = np.ones(len(symbols), dtype=bool)
+    keep[accented] = False
+    symbols, title_of = symbols[keep], title_of[keep]
+
+    # drop a separator that follows a separator or starts its title
+    separator = symbols == SEPARATOR
+    first = np.concatenate([[True], title_of[1:] != title_of[:-1]])
+    keep = ~(separator & (first | np.concatenate([[True], separator[:-1]])))
+    symbols, title_of = symbols[keep], title_of[keep]
+    # a run at the end leaves one separator behind as its title's last symbol
+    last = np.concatenate([title_of[1:] != title_of[:-1], [True]])
+    keep = ~((symbols == SEPARATOR) & last)
+    symbols, title_of = symbols[keep], title_of[keep]
+
+    new_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(title_of, minlength=n), out=new_offsets[1:])
+    return symbols, new_offsets
+
+
+def fold_query(text):
+    """Fold a query the same way titles are folded."""
+    raw = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    symbols, _ = _fold(raw, np.array([0, len(raw)], dtype=np.int64))
+    return symbols
+
+
+def _trigrams(symbols, offsets):
+    """(trigram code, title) for every trigram of every title padded with separators."""
+    n = len(offsets) - 1
+    lengths = np.diff(offsets)
+    # insert one separator before and after each title
+    padded = np.zeros(len(symbols) + 2 * n, dtype=np.int64)
+    title_of = np.repeat(np.arange(n), lengths)
+    padded[np.arange(len(symbols)) + 2 * title_of + 1] = symbols
+    padded_offsets = offsets + 2 * np.arange(n + 1)
+    # a trigram starting at i belongs to a title if i + 2 is still inside it
+    counts = lengths  # a padded title of length L + 2 has L trigrams
+    owner = np.repeat(np.arange(n), counts)
+    first = np.repeat(padded_offsets[:-1], counts)
+    within = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    at = first + within
+    codes = (padded[at] * ALPHABET + padded[at + 1]) * ALPHABET + padded[at + 2]
+    return codes, owner, counts
+
+
+class TitleIndex:
+    """Title search: sorted keys for type-ahead prefixes, trigrams for typos.
+
+    Prefix hits come first, in alphabetical order (an exact title sorts
+    before its extensions), matched against the title and the title without
+    a leading "The"/"A"/"An". Fuzzy hits follow, ranked by trigram
+    similarity. Everything is built with vectorized passes over the title
+    bytes, so a million titles index in seconds.
+    """
+
+    def __init__(self, keys, key_ids, trigram_offsets, trigram_ids, title_trigrams, title_offsets):
+        self.keys = keys  # sorted fixed-width folded titles (S KEY_WIDTH)
+        self.key_ids = key_ids  # movie id per key
+        self.trigram_offsets = trigram_offsets  # (ALPHABET**3 + 1,) into trigram_ids
+        self.trigram_ids = trigram_ids  # movie ids per trigram, ascending
+        self.title_trigrams = title_trigrams  # every title's trigram codes, in title order
+        self.title_offsets = title_offsets  # (titles + 1,) into title_trigrams
+
+    @classmethod
+    def build(cls, titles):
+        """Index a sequence of titles, or a catalog StringTable (read without decoding)."""
+        if hasattr(titles, "blob"):
+            blob, offsets = np.asarray(titles.blob), titles.offsets.astype(np.int64)
+        else:
+            encoded = [t.encode("utf-8") for t in titles]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        symbols, offsets = _fold(blob, offsets)
+        n = len(offsets) - 1
+
+        # fixed-width byte keys, one row per title
+        lengths = np.diff(offsets)
+        title_of = np.repeat(np.arange(n), lengths)
+        column = np.arange(len(symbols)) - offsets[title_of]
+        fits = column < KEY_WIDTH
+        matrix = np.zeros((n, KEY_WIDTH), dtype=np.uint8)
+        matrix[title_of[fits], column[fits]] = CHARS[symbols[fits]]
+        keys, key_ids = [matrix], [np.arange(n)]
+        for article in ARTICLES:
+            prefix = np.frombuffer(article, dtype=np.uint8)
+            rows = np.flatnonzero((matrix[:, :len(prefix)] == prefix).all(axis=1))
+            shifted = np.zeros((len(rows), KEY_WIDTH), dtype=np.uint8)
+            shifted[:, :KEY_WIDTH - len(prefix)] = matrix[rows, len(prefix):]
+            keys.append(shifted)
+            key_ids.append(rows)
+        keys = np.concatenate(keys).view(f"S{KEY_WIDTH}").ravel()
+        key_ids = np.concatenate(key_ids)
+        order = np.argsort(keys, kind="stable")
+
+        # trigram postings as one CSR structure, ids ascending within each trigram
+        codes, owner, counts = _trigrams(symbols, offsets)
+        title_trigrams = codes.astype(np.uint16)
+        title_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=title_offsets[1:])
+        # codes fit in uint16, where a stable sort is a radix sort; owners are
+        # already ascending, so they stay ascending within each trigram
+        by_code = np.argsort(codes.astype(np.uint16), kind="stable")
+        codes, owner = codes[by_code], owner[by_code]
+        distinct = np.ones(len(codes), dtype=bool)
+        distinct[1:] = (codes[1:] != codes[:-1]) | (owner[1:] != owner[:-1])
+        codes, owner = codes[distinct], owner[distinct]
+        trigram_offsets = np.zeros(ALPHABET ** 3 + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=ALPHABET ** 3), out=trigram_offsets[1:])
+        return cls(keys[order], key_ids[order].astype(np.int64), trigram_offsets,
+                   owner.astype(np.int32), title_trigrams, title_offsets)
+
+    def __len__(self):
+        return len(self.title_offsets) - 1
+
+    def prefix(self, symbols, k=10):
+        """Ids of up to k titles starting with the folded query, alphabetically."""
+        if len(symbols) == 0:
+            return np.empty(0, dtype=np.int64)
+        key = CHARS[symbols[:KEY_WIDTH - 1]].tobytes()
+        lo = np.searchsorted(self.keys, np.bytes_(key), side="left")
+        # every key that extends the prefix sorts below prefix + 0xff
+        hi = np.searchsorted(self.keys, np.bytes_(key + b"\xff"), side="left")
+        ids = self.key_ids[lo:hi]
+        if len(ids) > k:
+            # the article-stripped copies can repeat a title, so overfetch a little
+            ids = ids[:2 * k]
+        return np.array(list(dict.fromkeys(ids.tolist()))[:k], dtype=np.int64)
+
+    def fuzzy(self, symbols, k=10, min_similarity=0.4, max_candidates=1000, max_postings=50000):
+        """(ids, similarity) of titles sharing the most trigrams with the folded query.
+
+        Similarity is shared / (query + title - shared) trigrams. Candidates
+        come from the postings of the rarest query trigrams (at most
+        max_postings ids): a typo only breaks the few trigrams around it, so
+        a near match still shares most of the rare ones. Past max_candidates
+        the titles sharing most rare trigrams are kept, and those are scored
+        against their own trigram lists.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(symbols) < 3:
+            return empty
+        codes, _, _ = _trigrams(symbols, np.array([0, len(symbols)], dtype=np.int64))
+        codes = np.array(sorted(set(codes.tolist())), dtype=np.int64)
+        starts, stops = self.trigram_offsets[codes], self.trigram_offsets[codes + 1]
+        rarest = np.argsort(stops - starts, kind="stable")
+        starts, stops = starts[rarest], stops[rarest]
+
+        # a title reaching min_similarity contains one of the q - needed + 1 rarest
+        q = len(codes)
+        rare = q - max(1, math.ceil(min_similarity * q)) + 1
+        sizes = np.cumsum(stops[:rare] - starts[:rare])
+        rare = max(1, int(np.searchsorted(sizes, max_postings, side="right")))
+        hits = np.sort(np.concatenate([self.trigram_ids[a:b] for a, b in zip(starts[:rare], stops[:rare])]))
+        if len(hits) == 0:
+            return empty
+        first = np.flatnonzero(np.concatenate([[True], hits[1:] != hits[:-1]]))
+        candidates = hits[first].astype(np.int64)
+        if len(candidates) > max_candidates:
+            rare_hits = np.diff(np.append(first, len(hits)))
+            keep = np.sort(np.argpartition(-rare_hits, max_candidates - 1)[:max_candidates])
+            candidates = candidates[keep]
+
+        # gather each candidate's trigrams and count those in the query
+        in_query = np.zeros(ALPHABET ** 3, dtype=bool)
+        in_query[codes] = True
+        lengths = self.title_offsets[candidates + 1] - self.title_offsets[candidates]
+        owner = np.repeat(np.arange(len(candidates)), lengths)
+        at = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        found = in_query[self.title_trigrams[self.title_offsets[candidates][owner] + at]]
+        shared = np.minimum(np.bincount(owner, weights=found, minlength=len(candidates)), q)
+
+        similarity = shared / (q + lengths - shared)
+        keep = similarity >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep].astype(np.float32)
+        if len(candidates) > k:
+            top = np.argpartition(-similarity, k - 1)[:k]
+            candidates, similarity = candidates[top], similarity[top]
+        order = np.lexsort((candidates, -similarity))
+        return candidates[order], similarity[order]
+
+    def search(self, query, k=10):
+        """Up to k (movie id, score) hits: prefix matches score 1, typo matches their similarity."""
+        symbols = fold_query(query)
+        ids = self.prefix(symbols, k)
+        scores = np.ones(len(ids), dtype=np.float32)
+        if len(ids) < k:
+            fuzzy_ids, fuzzy_scores = self.fuzzy(symbols, k + len(ids))
+            new = ~np.isin(fuzzy_ids, ids)
+            ids = np.concatenate([ids, fuzzy_ids[new]])[:k]
+            scores = np.concatenate([scores, fuzzy_scores[new]])[:k]
+        return ids, scores
+
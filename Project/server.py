@@ -0,0 +1,208 @@
+import argparse
+import hmac
+import json
+import secrets
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from facets import Filters
+from instrumentation import metrics
+from persistence import WriteBehindStore
+from profile_store import ProfileStore
+from recommender import Recommender, UserProfile
+from sessions import SessionManager
+
+
+# Most results one request may ask for
+MAX_K = 100
+
+
+def _parse_k(value):
+    k = int(value)
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    return k
+
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    # set on the class by make_server
+    recommender = None
+    sessions = None
+    logins = None  # token from /login -> email
+
+    def send_json(self, status, payload):
+        self.send_body(status, "application/json", json.dumps(payload).encode("utf-8"))
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("body must be a JSON object")
+        return data
+
+    def gauges(self):
+        gauges = {"cache": self.recommender.cache.stats()}
+        if self.sessions is not None:
+            gauges["sessions"] = self.sessions.stats()
+        return gauges
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, dict({"status": "ok", "movies": len(self.recommender.catalog)}, **self.gauges()))
+        elif urlsplit(self.path).path == "/search":
+            query = parse_qs(urlsplit(self.path).query)
+            try:
+                k = _parse_k(query.get("k", ["10"])[0])
+            except ValueError as e:
+                self.send_json(400, {"error": f"bad request: {e}"})
+                return
+            self.send_json(200, {"results": self.recommender.search_json(query.get("q", [""])[0], k)})
+        elif self.path in ("/metrics", "/metrics.json"):
+            fmt = "json" if self.path.endswith(".json") else "prometheus"
+            self.send_body(200, *metrics.export(fmt, self.gauges()))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        routes = {
+            "/recommend": self.post_recommend,
+            "/login": self.post_login,
+            "/watched": self.post_watched,
+            "/logout": self.post_logout,
+        }
+        route = routes.get(self.path)
+        if route is None or (self.path != "/recommend" and self.sessions is None):
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            data = self.read_json()
+        except ValueError as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+            return
+        route(data)
+
+    def open_session(self, data):
+        """The session of the token /login handed out in data["token"], or None after sending an error."""
+        email = self.logins.get(str(data.get("token")))
+        if email is None:
+            self.send_json(401, {"error": "not logged in"})
+            return None
+        try:
+            return self.sessions.open(email)
+        except KeyError:
+            # the account was removed since
+            self.logins.pop(str(data.get("token")), None)
+            self.send_json(401, {"error": "not logged in"})
+            return None
+
+    def post_recommend(self, data):
+        # {"token": ...} uses that user's session; {"profile": {...}} is stateless
+        session = None
+        try:
+            if self.sessions is not None and "token" in data:
+                session = self.open_session(data)
+                if session is None:
+                    return
+            else:
+                profile = UserProfile.from_dict(data["profile"])
+            k = _parse_k(data.get("k", 5))
+            seed = data.get("seed")
+            seed = None if seed is None else int(seed)
+            if seed is not None and seed < 0:
+                raise ValueError("seed must not be negative")
+            filters = Filters.from_dict(data.get("filters"))
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+            return
+        with metrics.span("http_recommend"):
+            if session is not None:
+                ranked = self.sessions.recommend(session, k, seed, filters)
+                recommendations = [self.recommender.movie_json(rec) for rec in ranked]
+            else:
+                recommendations = self.recommender.recommend_json(profile, k, seed, filters)
+        self.send_json(200, {"recommendations": recommendations})
+
+    def post_login(self, data):
+        try:
+            email, password = str(data["email"]), str(data["password"])
+        except KeyError as e:
+            self.send_json(400, {"error": f"bad request: missing {e}"})
+            return
+        profile = self.sessions.store.get(email)
+        # same check as CineMate.login_user, in constant time
+        if profile is None or not hmac.compare_digest(str(profile.get("password") or ""), password):
+            self.send_json(401, {"error": "unknown email or wrong password"})
+            return
+        session = self.sessions.open(email, profile)
+        token = secrets.token_urlsafe(32)
+        self.logins[token] = email
+        self.send_json(200, {"token": token, "email": email, "watched": len(session.profile["watched_movies"])})
+
+    def post_watched(self, data):
+        try:
+            movie_id = int(data["movie_id"])
+            if not 0 <= movie_id < len(self.recommender.catalog):
+                raise ValueError(f"no movie {movie_id}")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+            return
+        session = self.open_session(data)
+        if session is not None:
+            self.send_json(200, {"added": self.sessions.mark_watched(session, movie_id)})
+
+    def post_logout(self, data):
+        # like the GUI, the session itself stays in memory until it is evicted
+        self.logins.pop(str(data.get("token")), None)
+        self.send_json(200, {"status": "ok"})
+
+    def log_message(self, format, *args):
+        # keep load tests quiet; errors still go through log_error
+        pass
+
+
+def make_server(recommender, host="127.0.0.1", port=8000, sessions=None):
+    handler = type("Handler", (RecommendationHandler,),
+                   {"recommender": recommender, "sessions": sessions, "logins": {}})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CineMate recommendation server")
+    parser.add_argument("--catalog", help="movie catalog (.csv, .jsonl or compiled .cmcat)")
+    parser.add_argument("--neighbors", help="item-item neighbor table from collaborative.py (.npz)")
+    parser.add_argument("--ann", help="embedding ANN index from embeddings.py (.npz)")
+    parser.add_argument("--model", help="matrix factorization model from factorization.py (.npz)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=1024, help="cached profiles (0 disables)")
+    parser.add_argument("--cache-ttl", type=float, default=300, help="seconds a cached ranking stays valid")
+    parser.add_argument("--db", help="profile store; enables /login, /watched, /logout and per-user sessions")
+    parser.add_argument("--session-memory-mb", type=float, default=256,
+                        help="memory for per-user sessions before the least recently used are dropped")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record timing spans and counters for /metrics (same as CINEMATE_METRICS=1)")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enabled = True
+
+    recommender = Recommender.from_path(args.catalog, args.neighbors, args.ann, args.model,
+                                        cache_size=args.cache_size, cache_ttl=args.cache_ttl)
+    store = sessions = None
+    if args.db:
+        store = WriteBehindStore(ProfileStore(args.db))
+        sessions = SessionManager(recommender, store, int(args.session_memory_mb * 2**20))
+    server = make_server(recommender, args.host, args.port, sessions)
+    print(f"Serving recommendations on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+        if store is not None:
+            store.close()
@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+
+from bitset import WatchedSet
+from instrumentation import metrics
+from recommender import UserProfile
+
+
+def _filters_key(filters):
+    return filters.key() if filters else None
+
+
+class Session:
+    """One logged-in user: their profile, watched bitset and live ranking (which shares the bitset)."""
+
+    def __init__(self, profile, watched):
+        self.profile = profile  # the store's profile dict, updated in place
+        self.watched = watched
+        self.ranking = None  # LiveRanking, built on the first recommendation
+        # held while the session is read or changed; eviction skips busy sessions
+        self.lock = threading.RLock()
+        self.size = 0
+
+    @property
+    def email(self):
+        return self.profile["email"]
+
+    def nbytes(self):
+        """Approximate memory held by the session, for the manager's budget."""
+        # rough overhead of the profile dict and one string per watched title
+        size = 1024 + sum(len(title) + 56 for title in self.profile["watched_movies"])
+        size += self.watched.words.nbytes
+        if self.ranking is not None:
+            size += self.ranking.nbytes()
+        return size
+
+
+class SessionManager:
+    """Keeps many users' sessions in memory under one byte budget.
+
+    Sessions are kept in least recently used order. When their total size
+    goes over memory_budget, the idle ones at the old end are dropped. Every
+    change is already written to the store (a WriteBehindStore buffers the
+    writes), so eviction loses nothing. The next open() re-hydrates the
+    session from the persisted watched set instead of re-resolving every
+    title. That is stored as sorted ids while the user has watched a small
+    part of the catalog, so saving it after each watch stays cheap; the
+    dense bitset only exists in memory. The live ranking is then rebuilt on
+    the first recommendation.
+    """
+
+    def __init__(self, recommender, store, memory_budget=256 * 2**20):
+        self.recommender = recommender
+        self.catalog = recommender.catalog
+        self.store = store
+        self.memory_budget = memory_budget
+        self.sessions = OrderedDict()  # email -> Session, least recently used first
+        self.lock = threading.Lock()
+        self.used = 0
+        self.hydrations = 0
+        self.evictions = 0
+
+    def open(self, email, profile=None):
+        """The user's session, loaded from the store unless it is still in memory.
+
+        profile, if given, is the user's freshly read or registered profile dict.
+        Raises KeyError for an email the store does not know.
+        """
+        with self.lock:
+            session = self.sessions.get(email)
+            if session is not None:
+                self.sessions.move_to_end(email)
+                return session
+        session = self.hydrate(email, profile)
+        with self.lock:
+            # another thread may have opened it meanwhile
+            existing = self.sessions.get(email)
+            if existing is not None:
+                return existing
+            self.sessions[email] = session
+            self.used += session.size
+        self.evict()
+        return session
+
+    def hydrate(self, email, profile=None):
+        with metrics.span("session_hydrate"):
+            if profile is None:
+                profile = self.store.get(email)
+                if profile is None:
+                    raise KeyError(email)
+            # the persisted bitset is only valid for the catalog it was built against
+            watched = None
+            bits = self.store.load_watched_bits(email, self.catalog.version)
+            if bits is not None:
+                try:
+                    watched = WatchedSet.from_bytes(len(self.catalog), bits)
+                except ValueError:
+                    pass
+            if watched is None:
+                watched = self.catalog.watched_set(profile["watched_movies"])
+                self.store.save_watched_bits(email, self.catalog.version, watched.to_bytes())
+            session = Session(profile, watched)
+            session.size = session.nbytes()
+        with self.lock:
+            self.hydrations += 1
+        return session
+
+    def recommend(self, session, k=5, seed=None, filters=None):
+        """Top k for the session, patching its live ranking rather than rescoring."""
+        with session.lock:
+            profile = UserProfile.from_dict(session.profile)
+            ranking = session.ranking
+            if ranking is None or ranking.k != k or _filters_key(ranking.filters) != _filters_key(filters):
+                session.ranking = self.recommender.ranking(profile, k, session.watched, filters)
+            else:
+                ranking.update(profile, session.watched)
+            recommendations = session.ranking.top(seed)
+        self.resize(session)
+        return recommendations
+
+    def mark_watched(self, session, movie_id):
+        """Add a movie to the session's history; False if it was already watched."""
+        title = self.catalog.titles[movie_id]
+        with session.lock:
+            if movie_id in session.watched:
+                return False
+            session.profile["watched_movies"].append(title)
+            session.watched.add(movie_id)
+            self.store.add_watched(session.email, title)
+            self.store.save_watched_bits(session.email, self.catalog.version, session.watched.to_bytes())
+        self.resize(session)
+        return True
+
+    def resize(self, session):
+        size = session.nbytes()
+        with self.lock:
+            if self.sessions.get(session.email) is session:
+                self.used += size - session.size
+            session.size = size
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used idle sessions until the budget is met."""
+        with self.lock:
+            for email in list(self.sessions):
+                if self.used <= self.memory_budget or len(self.sessions) == 1:
+                    break
+                session = self.sessions[email]
+                # a session in use by another thread is not idle
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    del self.sessions[email]
+                    self.used -= session.size
+                    self.evictions += 1
+                finally:
+                    session.lock.release()
+                metrics.count("sessions_evicted")
+
+    def close(self, email):
+        """Forget a user's session, e.g. when their account is removed."""
+        with self.lock:
+            session = self.sessions.pop(email, None)
+            if session is not None:
+                self.used -= session.size
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, email):
+        return email in self.sessions
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.sessions),
+                "bytes": self.used,
+                "budget_bytes": self.memory_budget,
+                "hydrations": self.hydrations,
+                "evictions": self.evictions,
+            }
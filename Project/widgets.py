@@ -0,0 +1,105 @@
+import math
+import tkinter as tk
+from tkinter import ttk
+
+from instrumentation import metrics
+
+
+class VirtualGrid(ttk.Frame):
+    """Scrollable grid that only builds widgets for the cells currently on screen.
+
+    A fixed pool of cells is created by make_cell(parent) and reused while
+    scrolling: fill_cell(cell, item) just updates the existing widgets. With
+    cell_width=None the grid is a single full-width column, i.e. a list.
+    """
+
+    def __init__(self, parent, cell_height, make_cell, fill_cell, cell_width=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.make_cell = make_cell
+        self.fill_cell = fill_cell
+        self.items = []
+        self.pool = []  # [frame, cell handle, index of the item it shows]
+        self.top = 0  # scroll position in pixels
+
+        self.body = ttk.Frame(self)
+        self.body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.body.bind("<Configure>", lambda e: self.render())
+        for widget in (self.body, self):
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", lambda e: self.scroll_pixels(-self.cell_height // 2))
+            widget.bind("<Button-5>", lambda e: self.scroll_pixels(self.cell_height // 2))
+
+    def set_items(self, items):
+        self.items = items
+        for slot in self.pool:
+            slot[2] = None  # force a refill, the data behind each index changed
+        self.top = min(self.top, self.max_top())
+        self.render()
+
+    def columns(self):
+        if self.cell_width is None:
+            return 1
+        return max(1, self.body.winfo_width() // self.cell_width)
+
+    def total_height(self):
+        return math.ceil(len(self.items) / self.columns()) * self.cell_height
+
+    def max_top(self):
+        return max(0, self.total_height() - self.body.winfo_height())
+
+    def scroll_pixels(self, delta):
+        self.top = min(max(0, self.top + delta), self.max_top())
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.scroll_pixels(-int(event.delta / 120) * (self.cell_height // 2))
+
+    def yview(self, action, value, unit=None):
+        if action == "moveto":
+            self.top = min(max(0, int(float(value) * self.total_height())), self.max_top())
+            self.render()
+        elif action == "scroll":
+            step = self.body.winfo_height() if unit == "pages" else self.cell_height // 2
+            self.scroll_pixels(int(value) * step)
+
+    def render(self):
+        height = self.body.winfo_height()
+        width = self.body.winfo_width()
+        if height <= 1:
+            return  # not mapped yet; <Configure> will call back
+        columns = self.columns()
+        cell_width = width if self.cell_width is None else self.cell_width
+        first_row, offset = divmod(self.top, self.cell_height)
+        visible_rows = math.ceil((height + offset) / self.cell_height)
+
+        needed = visible_rows * columns
+        while len(self.pool) < needed:
+            frame = ttk.Frame(self.body)
+            frame.bind("<MouseWheel>", self.on_mousewheel)
+            self.pool.append([frame, self.make_cell(frame), None])
+            metrics.count("widgets_built")
+
+        for i, slot in enumerate(self.pool):
+            frame, cell, shown = slot
+            row, col = divmod(i, columns)
+            index = (first_row + row) * columns + col
+            if i >= needed or index >= len(self.items):
+                frame.place_forget()
+                continue
+            if shown != index:
+                self.fill_cell(cell, self.items[index])
+                slot[2] = index
+                metrics.count("cells_filled")
+            frame.place(x=col * cell_width, y=row * self.cell_height - offset,
+                        width=cell_width, height=self.cell_height)
+
+        total = self.total_height()
+        if total <= height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / total, (self.top + height) / total)